@@ -4,51 +4,69 @@ import uuid
 
 import plotly.express as px
 
+from utils.artefactos import particion, precalculado_o_calcular
+from utils.calculos import costos_por_tipo_insumo, presupuesto_vs_ejecutado, resumen_costos_por_cultivo
+from utils.carga import cargar_en_paralelo, leer_costos, leer_presupuesto
+from utils.claves import cargar_alias
+from utils.esquemas import unir_cuarentenas
+from utils.memoria import cache_de_sesion, en_cache, huella, texto_memoria, vista
+
 st.set_page_config(page_title="Costos por Cultivo en USD/ha", layout="wide")
 
-@st.cache_data
+# Una sola copia por proceso, compartida por todas las sesiones: no se modifica
+@st.cache_resource
 def cargar_datos():
-    df = pd.read_excel("data/InformeOtRealizadas_al_2025-07-18.xlsx", sheet_name="Worksheet")
-    df.columns = df.columns.str.strip()
-    df["Total"] = pd.to_numeric(df["Total"], errors="coerce")
-    df["Superficie"] = pd.to_numeric(df["Superficie"], errors="coerce")
-    df["Precio"] = pd.to_numeric(df["Precio"], errors="coerce")
-    df["USD_ha"] = df["Total"] / df["Superficie"]
-    df["Cultivo"] = df["Cultivo"].astype(str)
-    return df
-
-df = cargar_datos()
-
-@st.cache_data
-def cargar_presupuesto():
-    # Fixed: Specify the correct sheet name "Hoja1" where the data is located
-    df = pd.read_excel("data/CultivosPresupuestados.xlsx", sheet_name="Hoja1", index_col=None)
-    df.columns = df.columns.str.strip()
-    df["Total"] = pd.to_numeric(df["TotalUSD"], errors="coerce")
-    df["USD_presupuestado"] = df["TotalUSD"]
-    df["Cultivo"] = df["Cultivo"].astype(str)
-    df["Tipo Insumo"] = df["TipoInsumo"].astype(str)
-    df["Especie"] = df["Especie"].astype(str)  # Aseguramos que Especie sea string
-    return df
-
-# Removed the debugging line that was causing issues
-df_presupuesto = cargar_presupuesto()
+    # Costos y presupuesto son independientes: se parsean en paralelo
+    return cargar_en_paralelo({"costos": leer_costos, "presupuesto": leer_presupuesto})
+
+datos, errores = cargar_datos()
+if errores:
+    cargar_datos.clear()
+    for nombre, error in errores.items():
+        st.error(f"No se pudo cargar '{nombre}': {error}")
+    st.stop()
+
+df, cuarentena_costos = datos["costos"]
+df_presupuesto, cuarentena_presupuesto = datos["presupuesto"]
+cuarentena = unir_cuarentenas(cuarentena_costos, cuarentena_presupuesto)
+
+cache = cache_de_sesion(st.session_state)
 
 # Sidebar: filtros
 st.sidebar.header("🎛️ Filtros")
 empresas = st.sidebar.multiselect("Empresa", df["Empresa"].unique(), default=df["Empresa"].unique())
 especies = st.sidebar.multiselect("Especie", df["Especie"].unique(), default=df["Especie"].unique())
 
-df_filtrado = df[
-    (df["Empresa"].isin(empresas)) &
-    (df["Especie"].isin(especies))
-]
+# Los filtros son máscaras sobre el DataFrame compartido; las filas elegidas
+# se copian solo al calcular un resultado que no está en la cache de la sesión
+mascara = (df["Empresa"].isin(empresas) & df["Especie"].isin(especies)).to_numpy()
+
+campos_disponibles = df.loc[mascara, "Campo"].unique()
+campos = st.sidebar.multiselect("Campo", campos_disponibles, default=campos_disponibles)
+mascara = mascara & df["Campo"].isin(campos).to_numpy()
+
+cultivos_disponibles = df.loc[mascara, "Cultivo"].unique()
+cultivos = st.sidebar.multiselect("Cultivo", cultivos_disponibles, default=cultivos_disponibles)
+mascara = mascara & df["Cultivo"].isin(cultivos).to_numpy()
+hay_datos = mascara.any()
 
-campos = st.sidebar.multiselect("Campo", df_filtrado["Campo"].unique(), default=df_filtrado["Campo"].unique())
-df_filtrado = df_filtrado[df_filtrado["Campo"].isin(campos)]
+# Si solo se filtró por empresa (todas o una) hay resultados precalculados
+clave_precalculada = None
+if mascara.sum() == df["Empresa"].isin(empresas).sum():
+    if len(empresas) == df["Empresa"].nunique():
+        clave_precalculada = particion()
+    elif len(empresas) == 1:
+        clave_precalculada = particion(empresas[0])
 
-cultivos = st.sidebar.multiselect("Cultivo", df_filtrado["Cultivo"].unique(), default=df_filtrado["Cultivo"].unique())
-df_filtrado = df_filtrado[df_filtrado["Cultivo"].isin(cultivos)]
+
+def resultado(nombre, funcion, *args):
+    # Por selección de filtros: precalculado si corresponde; si no, sobre las filas elegidas
+    return en_cache(cache, (nombre, huella(mascara), clave_precalculada), precalculado_o_calcular,
+                    nombre, clave_precalculada, lambda: funcion(vista(df, mascara), *args))
+
+if not cuarentena.empty:
+    with st.expander(f"⚠️ {len(cuarentena)} filas en cuarentena (no se usan en el análisis)"):
+        st.dataframe(cuarentena, use_container_width=True)
 
 # Tabs
 tab1, tab2, tab3 = st.tabs([
@@ -61,23 +79,17 @@ tab1, tab2, tab3 = st.tabs([
 with tab1:
     st.title("🌱 Costos por Cultivo (USD/ha)")
 
-    if df_filtrado.empty:
+    if not hay_datos:
         st.warning("No hay datos para los filtros seleccionados.")
     else:
-        resumen = []
-
-        for cultivo, grupo in df_filtrado.groupby("Cultivo"):
-            superficie = grupo["Superficie"].dropna().iloc[0] if grupo["Superficie"].notna().any() else None
-            if superficie and superficie > 0:
-                total = grupo["Total"].sum()
-                usd_ha = total / superficie
-                resumen.append({
-                    "Cultivo": cultivo,
-                    "Superficie (ha)": superficie,
-                    "Costo Total (USD)": total,
-                    "Costo USD/ha": usd_ha
-                })
-
+        resumen_df = resultado("costos_por_cultivo", resumen_costos_por_cultivo)
+        superficies = resumen_df.set_index("Cultivo")["Superficie (ha)"]
+
+        for cultivo, posiciones in sorted(df.groupby("Cultivo").indices.items()):
+            superficie = superficies.get(cultivo)
+            posiciones = posiciones[mascara[posiciones]]
+            if superficie is not None and len(posiciones):
+                grupo = df.iloc[posiciones]
                 st.subheader(f"🌾 {cultivo}")
                 st.dataframe(grupo[["Labor / Insumo", "Tipo Insumo", "Cantidad Ejecutada", "Precio", "Total", "USD_ha"]],
                              use_container_width=True)
@@ -96,7 +108,7 @@ with tab1:
                 # Mostrar los 15 principales y agrupar el resto en "Otros"
                 top_n = 15
                 if len(plot_data) > top_n:
-                    top_data = plot_data.iloc[:top_n].copy()
+                    top_data = plot_data.iloc[:top_n]
                     otros_total = plot_data.iloc[top_n:]["USD_ha"].sum()
                     otros_fila = pd.DataFrame([{"Labor / Insumo": "Otros", "USD_ha": otros_total}])
                     plot_data = pd.concat([top_data, otros_fila], ignore_index=True)
@@ -117,7 +129,6 @@ with tab1:
 
         # Resumen general
         st.markdown("## 📋 Comparativa entre cultivos")
-        resumen_df = pd.DataFrame(resumen)
         st.dataframe(resumen_df, use_container_width=True)
 
         st.markdown("### 📊 Gráfico de costos por cultivo (USD/ha)")
@@ -136,22 +147,10 @@ with tab1:
 with tab2:
     st.title("📊 Comparación de Costos por Tipo de Insumo")
 
-    if df_filtrado.empty:
+    if not hay_datos:
         st.warning("No hay datos para mostrar.")
     else:
-        df_agrupado = []
-        for cultivo, grupo in df_filtrado.groupby("Cultivo"):
-            superficie = grupo["Superficie"].dropna().iloc[0] if grupo["Superficie"].notna().any() else None
-            if superficie and superficie > 0:
-                resumen_tipo = grupo.groupby("Tipo Insumo")["Total"].sum() / superficie
-                for tipo, usd_ha in resumen_tipo.items():
-                    df_agrupado.append({
-                        "Cultivo": cultivo,
-                        "Tipo Insumo": tipo,
-                        "USD/ha": usd_ha
-                    })
-
-        df_tipo_insumo = pd.DataFrame(df_agrupado)
+        df_tipo_insumo = resultado("costos_por_tipo_insumo", costos_por_tipo_insumo)
         st.dataframe(df_tipo_insumo, use_container_width=True)
 
         fig = px.bar(
@@ -168,124 +167,14 @@ with tab2:
 
 # TAB 3
 with tab3:
-    # st.title("📉 Comparativa Presupuesto vs Ejecutado por Especie")
-    # if df_filtrado.empty:
-    #     st.warning("No hay datos para mostrar.")
-    # else:
-    #     comparativo = []
-
-    #       # Homogeneizar nombres para merge
-    #     df_presupuesto["Tipo Insumo"] = df_presupuesto["Tipo Insumo"].str.strip().str.lower()
-    #     df_filtrado["Tipo Insumo"] = df_filtrado["Tipo Insumo"].str.strip().str.lower()
-
-
-    #     for especie, grupo in df_filtrado.groupby("Especie"):
-    #         # Para cada cultivo dentro de la especie, calcular USD/ha
-    #         ejecutado_por_cultivo = []
-            
-    #         for cultivo, subgrupo in grupo.groupby("Cultivo"):
-    #             superficie_cultivo = subgrupo["Superficie"].dropna().iloc[0] if subgrupo["Superficie"].notna().any() else None
-    #             if superficie_cultivo and superficie_cultivo > 0:
-    #                 # Calcular USD/ha por tipo de insumo para este cultivo específico
-    #                 usd_ha_por_insumo = subgrupo.groupby("Tipo Insumo")["Total"].sum() / superficie_cultivo
-    #                 ejecutado_por_cultivo.append(usd_ha_por_insumo)
-            
-    #         if ejecutado_por_cultivo:
-    #             # Promediar los USD/ha entre todos los cultivos de la especie
-    #             ejecutado_promedio = pd.concat(ejecutado_por_cultivo, axis=1).mean(axis=1)
-    #             ejecutado_df = ejecutado_promedio.reset_index()
-    #             ejecutado_df.columns = ["Tipo Insumo", "USD_ejecutado"]
-    #             ejecutado_df["Especie"] = especie
-
-    #             # Obtener datos de presupuesto para esta especie
-    #             presup = df_presupuesto[df_presupuesto["Especie"] == especie].copy()
-                
-    #             # Agrupar presupuesto por tipo de insumo (promediando si hay múltiples registros)
-    #             presup_agrupado = presup.groupby("Tipo Insumo")["USD_presupuestado"].sum().reset_index()
-
-    #             # Hacer merge entre ejecutado y presupuestado
-    #             comparado = pd.merge(ejecutado_df, presup_agrupado, on="Tipo Insumo", how="outer")
-    #             comparado["Especie"] = especie
-    #             comparado = comparado.fillna(0)
-
-    #             comparado["Diferencia"] = comparado["USD_ejecutado"] - comparado["USD_presupuestado"]
-    #             comparado["% Ejecutado"] = comparado.apply(
-    #                 lambda row: (row["USD_ejecutado"] / row["USD_presupuestado"] * 100) if row["USD_presupuestado"] > 0 else 0,
-    #                 axis=1
-    #             ).round(1)
-
-    #             comparativo.append(comparado)
-
-    #         if comparativo:
-    #             df_comparativo = pd.concat(comparativo, ignore_index=True)
-    #             st.dataframe(df_comparativo, use_container_width=True)
-
-    #             especies_disponibles = df_comparativo["Especie"].unique()
-    #             especie_sel = st.selectbox("Seleccionar Especie", especies_disponibles)
-
-    #             df_especie = df_comparativo[df_comparativo["Especie"] == especie_sel]
-
-    #             if not df_especie.empty:
-    #                 fig = px.bar(
-    #                     df_especie.melt(id_vars="Tipo Insumo", value_vars=["USD_presupuestado", "USD_ejecutado"],
-    #                                     var_name="Tipo", value_name="USD/ha"),
-    #                     x="Tipo Insumo",
-    #                     y="USD/ha",
-    #                     color="Tipo",
-    #                     barmode="group",
-    #                     title=f"Presupuesto vs Ejecutado - {especie_sel}",
-    #                     text_auto=".2f"
-    #                 )
-    #                 fig.update_layout(xaxis_title="Tipo Insumo", yaxis_title="USD/ha")
-    #                 st.plotly_chart(fig, use_container_width=True, key=f"chart_{especie_sel}")
-    #             else:
-    #                 st.warning(f"No hay datos disponibles para la especie {especie_sel}")
-    #         else:
-    #             st.warning("No hay datos para mostrar en la comparativa.")
-    #     else:
-    #         st.warning("No hay datos de comparación disponibles.")
-
-    
     st.title("📉 Comparativa Presupuesto vs Ejecutado por Especie")
-    if df_filtrado.empty:
+    if not hay_datos:
         st.warning("No hay datos para mostrar.")
     else:
-        comparativo = []
-
-        # Homogeneizar nombres para merge
-        df_presupuesto["Tipo Insumo"] = df_presupuesto["Tipo Insumo"].str.strip().str.lower()
-        df_filtrado["Tipo Insumo"] = df_filtrado["Tipo Insumo"].str.strip().str.lower()
-
-        for especie, grupo in df_filtrado.groupby("Especie"):
-            ejecutado_por_cultivo = []
-            for cultivo, subgrupo in grupo.groupby("Cultivo"):
-                superficie_cultivo = subgrupo["Superficie"].dropna().iloc[0] if subgrupo["Superficie"].notna().any() else None
-                if superficie_cultivo and superficie_cultivo > 0:
-                    usd_ha_por_insumo = subgrupo.groupby("Tipo Insumo")["Total"].sum() / superficie_cultivo
-                    ejecutado_por_cultivo.append(usd_ha_por_insumo)
-
-            if ejecutado_por_cultivo:
-                ejecutado_promedio = pd.concat(ejecutado_por_cultivo, axis=1).mean(axis=1)
-                ejecutado_df = ejecutado_promedio.reset_index()
-                ejecutado_df.columns = ["Tipo Insumo", "USD_ejecutado"]
-                ejecutado_df["Especie"] = especie
-
-                presup = df_presupuesto[df_presupuesto["Especie"] == especie].copy()
-                presup_agrupado = presup.groupby("Tipo Insumo")["USD_presupuestado"].sum().reset_index()
-
-                comparado = pd.merge(ejecutado_df, presup_agrupado, on="Tipo Insumo", how="outer")
-                comparado["Especie"] = especie
-                comparado = comparado.fillna(0)
-                comparado["Diferencia"] = comparado["USD_ejecutado"] - comparado["USD_presupuestado"]
-                comparado["% Ejecutado"] = comparado.apply(
-                    lambda row: (row["USD_ejecutado"] / row["USD_presupuestado"] * 100) if row["USD_presupuestado"] > 0 else 0,
-                    axis=1
-                ).round(1)
-
-                comparativo.append(comparado)
-
-        if comparativo:
-            df_comparativo = pd.concat(comparativo, ignore_index=True)
+        df_comparativo = resultado("presupuesto_vs_ejecutado", presupuesto_vs_ejecutado, df_presupuesto,
+                                   cargar_alias("tipo_insumo"))
+
+        if not df_comparativo.empty:
             st.dataframe(df_comparativo, use_container_width=True)
 
             especies_disponibles = df_comparativo["Especie"].unique()
@@ -310,3 +199,7 @@ with tab3:
                 st.warning(f"No hay datos disponibles para la especie {especie_sel}")
         else:
             st.warning("No hay datos de comparación disponibles.")
+
+# Memoria de la sesión (resultados guardados) y del proceso
+valor, ayuda = texto_memoria(cache)
+st.sidebar.metric("🧠 Memoria de la sesión", valor, help=ayuda)
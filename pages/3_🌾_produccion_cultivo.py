@@ -1,33 +1,18 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
+from utils.carga import leer_produccion
+from utils.memoria import cache_de_sesion, en_cache, huella, texto_memoria, vista
+
 st.set_page_config(page_title="Producción por Cultivo", layout="wide")
 
-@st.cache_data
+# Una sola copia por proceso, compartida por todas las sesiones: no se modifica
+@st.cache_resource
 def cargar_datos():
-    df = pd.read_excel("data/Produccion Por Cultivo.xlsx", sheet_name="Hoja1")
-    df.columns = df.columns.str.strip()
-    df = df.rename(columns={
-        "Cultivo": "cultivo",
-        "Especie": "especie",
-        "Campo": "campo",
-        "Superficie (ha)": "sup_total",
-        "Sup. Cosechada (ha)": "sup_cosechada",
-        "% Avance": "avance",
-        "Ton Chacra": "ton_chacra",
-        "Rinde Chacra (tn/ha)": "rinde_chacra",
-        "Ton Destino": "ton_destino",
-        "Rinde Destino (tn/ha)": "rinde_destino",
-        "Ton Acondicionado": "ton_acondicionado",
-        "Rinde Acondicionado (tn/ha)": "rinde_acondicionado"
-    })
-    for col in ["sup_total", "sup_cosechada", "avance", "ton_chacra", "rinde_chacra",
-                "ton_destino", "rinde_destino", "ton_acondicionado", "rinde_acondicionado"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
+    return leer_produccion()
 
-df = cargar_datos()
+df, cuarentena = cargar_datos()
+cache = cache_de_sesion(st.session_state)
 
 # Filtros
 st.sidebar.header("🎛️ Filtros")
@@ -35,13 +20,18 @@ campos = st.sidebar.multiselect("Campo", df["campo"].unique(), default=df["campo
 especies = st.sidebar.multiselect("Especie", df["especie"].unique(), default=df["especie"].unique())
 cultivos = st.sidebar.multiselect("Cultivo", df["cultivo"].unique(), default=df["cultivo"].unique())
 
-df_filtrado = df[
-    (df["campo"].isin(campos)) &
-    (df["especie"].isin(especies)) &
-    (df["cultivo"].isin(cultivos))
-]
+mascara = (
+    df["campo"].isin(campos) &
+    df["especie"].isin(especies) &
+    df["cultivo"].isin(cultivos)
+).to_numpy()
+# Las filas elegidas se copian una vez por selección; tablas y gráficos las reutilizan
+df_filtrado = en_cache(cache, ("produccion", huella(mascara)), vista, df, mascara)
 
 st.title("🌾 Producción por Cultivo")
+if not cuarentena.empty:
+    with st.expander(f"⚠️ {len(cuarentena)} filas en cuarentena (no se usan en el análisis)"):
+        st.dataframe(cuarentena, use_container_width=True)
 
 if df_filtrado.empty:
     st.warning("No hay datos para los filtros seleccionados.")
@@ -90,3 +80,7 @@ else:
         title="Distribución de producción por cultivo"
     )
     st.plotly_chart(fig, use_container_width=True)
+
+# Memoria de la sesión (resultados guardados) y del proceso
+valor, ayuda = texto_memoria(cache)
+st.sidebar.metric("🧠 Memoria de la sesión", valor, help=ayuda)
@@ -2,79 +2,103 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from utils.calculos import resumen_cosecha_por_cultivo, resumen_diario_cosecha
+from utils.ingesta import INTERVALO_REFRESCO, abrir_almacen, detalle, ingerir, opciones, resumen_diario
+from utils.memoria import cache_de_sesion, texto_memoria
+from utils.mermas import desglose_mermas
+
 st.set_page_config(page_title="Reporte de Cosecha y Mermas", layout="wide")
 
-@st.cache_data
-def cargar_datos():
-    df = pd.read_excel("data/ordenes de carga.xlsx", sheet_name=0)
-    df.columns = df.columns.str.strip()
-    df = df.rename(columns={
-        "Fecha": "fecha",
-        "Empresa": "empresa",
-        "Cultivo": "cultivo",
-        "Kg Origen": "kg_origen",
-        "Kg Final": "kg_final",
-        "Humedad": "humedad",
-        "Diferencia Kg": "dif_kg",
-        "Diferencia %": "dif_pct"
-    })
-    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-    df["kg_origen"] = pd.to_numeric(df["kg_origen"], errors="coerce")
-    df["kg_final"] = pd.to_numeric(df["kg_final"], errors="coerce")
-    df["dif_kg"] = pd.to_numeric(df["dif_kg"], errors="coerce")
-    df["dif_pct"] = pd.to_numeric(df["dif_pct"], errors="coerce")
-    return df.dropna(subset=["fecha", "empresa", "cultivo"])
-
-df = cargar_datos()
+# Un almacén por proceso, compartido por todas las sesiones: las órdenes que
+# llegan a la carpeta de entrada se suman sin volver a leer el archivo completo
+@st.cache_resource
+def cargar_almacen():
+    return abrir_almacen()
+
+almacen = cargar_almacen()
+empresas_disponibles, cultivos_disponibles, fecha_min, fecha_max = opciones(almacen)
 
 # Filtros
 st.sidebar.header("🎛️ Filtros")
-empresas = st.sidebar.multiselect("Empresa", df["empresa"].unique(), default=df["empresa"].unique())
-cultivos = st.sidebar.multiselect("Cultivo", df["cultivo"].unique(), default=df["cultivo"].unique())
-rango_fechas = st.sidebar.date_input("Rango de fechas", [df["fecha"].min(), df["fecha"].max()])
+empresas = st.sidebar.multiselect("Empresa", empresas_disponibles, default=empresas_disponibles)
+cultivos = st.sidebar.multiselect("Cultivo", cultivos_disponibles, default=cultivos_disponibles)
+rango_fechas = st.sidebar.date_input("Rango de fechas", [fecha_min, fecha_max])
 
-df_filtrado = df[
-    (df["empresa"].isin(empresas)) &
-    (df["cultivo"].isin(cultivos)) &
-    (df["fecha"] >= pd.to_datetime(rango_fechas[0])) &
-    (df["fecha"] <= pd.to_datetime(rango_fechas[1]))
-]
+# Con todo seleccionado el filtro queda abierto, así entran las órdenes que lleguen después
+filtros = {
+    "empresas": None if len(empresas) == len(empresas_disponibles) else empresas,
+    "cultivos": None if len(cultivos) == len(cultivos_disponibles) else cultivos,
+    "desde": None if rango_fechas[0] == fecha_min.date() else pd.to_datetime(rango_fechas[0]),
+    "hasta": None if rango_fechas[-1] == fecha_max.date() else pd.to_datetime(rango_fechas[-1]),
+}
+
+# Memoria de la sesión (resultados guardados) y del proceso
+valor, ayuda = texto_memoria(cache_de_sesion(st.session_state))
+st.sidebar.metric("🧠 Memoria de la sesión", valor, help=ayuda)
 
 st.title("🚜 Reporte de Rendimiento y Mermas por Cosecha")
 
-if df_filtrado.empty:
-    st.warning("No hay datos para los filtros seleccionados.")
-else:
-    # Resumen diario
-    resumen_diario = df_filtrado.groupby("fecha").agg({
-        "kg_origen": "sum",
-        "kg_final": "sum",
-        "dif_kg": "sum"
-    }).reset_index()
-    resumen_diario["avance_acumulado"] = resumen_diario["kg_final"].cumsum()
-
-    st.subheader("📅 Producción diaria (Kg Final)")
-    fig = px.bar(resumen_diario, x="fecha", y="kg_final", text_auto=True, labels={"kg_final": "Kg netos"})
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.subheader("📈 Avance acumulado de cosecha")
-    fig = px.line(resumen_diario, x="fecha", y="avance_acumulado", markers=True, labels={"avance_acumulado": "Kg acumulados"})
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.subheader("📉 Comparación Kg Origen vs Kg Final")
-    fig = px.bar(resumen_diario, x="fecha", y=["kg_origen", "kg_final"], barmode="group")
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.subheader("⚖️ Mermas por día (Kg)")
-    fig = px.bar(resumen_diario, x="fecha", y="dif_kg", text_auto=True, labels={"dif_kg": "Merma (Kg)"})
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.subheader("📋 Resumen por Cultivo y Empresa")
-    resumen_cultivo = df_filtrado.groupby(["empresa", "cultivo"]).agg({
-        "kg_origen": "sum",
-        "kg_final": "sum",
-        "dif_kg": "sum"
-    }).reset_index()
-    resumen_cultivo["dif_pct"] = resumen_cultivo["dif_kg"] / resumen_cultivo["kg_origen"]
-
-    st.dataframe(resumen_cultivo, use_container_width=True)
+
+@st.fragment(run_every=INTERVALO_REFRESCO)
+def panel_cosecha(filtros):
+    if ingerir(almacen) and opciones(almacen)[:2] != (empresas_disponibles, cultivos_disponibles):
+        # Llegó una empresa o un cultivo nuevo: se rearman los filtros
+        st.rerun()
+
+    st.caption(f"Actualizado {almacen['actualizado']:%d/%m %H:%M:%S} · "
+               f"{almacen['filas_nuevas']} órdenes recibidas desde el inicio")
+    if almacen["errores"]:
+        with st.expander(f"❌ {len(almacen['errores'])} archivos de la carpeta de entrada no se pudieron leer"):
+            for ruta, error in almacen["errores"].items():
+                st.write(f"**{ruta}**: {error}")
+    cuarentena = almacen["cuarentena"]
+    if not cuarentena.empty:
+        with st.expander(f"⚠️ {len(cuarentena)} filas en cuarentena (no se usan en el análisis)"):
+            st.dataframe(cuarentena, use_container_width=True)
+
+    df_filtrado = detalle(almacen, **filtros)
+    if df_filtrado.empty:
+        st.warning("No hay datos para los filtros seleccionados.")
+    else:
+        # Resumen diario: sin filtros se usa el que el almacén mantiene al día
+        if all(valor is None for valor in filtros.values()):
+            resumen = resumen_diario(almacen)
+        else:
+            resumen = resumen_diario_cosecha(df_filtrado)
+
+        st.subheader("📅 Producción diaria (Kg Final)")
+        fig = px.bar(resumen, x="fecha", y="kg_final", text_auto=True, labels={"kg_final": "Kg netos"})
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("📈 Avance acumulado de cosecha")
+        fig = px.line(resumen, x="fecha", y="avance_acumulado", markers=True, labels={"avance_acumulado": "Kg acumulados"})
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("📉 Comparación Kg Origen vs Kg Final")
+        fig = px.bar(resumen, x="fecha", y=["kg_origen", "kg_final"], barmode="group")
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("⚖️ Mermas por día (Kg)")
+        fig = px.bar(resumen, x="fecha", y="dif_kg", text_auto=True, labels={"dif_kg": "Merma (Kg)"})
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("💧 Merma esperada por humedad vs no explicada (Kg)")
+        fig = px.bar(
+            resumen,
+            x="fecha",
+            y=["merma_esperada_kg", "merma_no_explicada_kg"],
+            barmode="stack",
+            labels={"value": "Kg", "variable": "Merma"}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("📋 Resumen por Cultivo y Empresa")
+        resumen_cultivo = resumen_cosecha_por_cultivo(df_filtrado)
+
+        st.dataframe(resumen_cultivo, use_container_width=True)
+
+        st.subheader("🔎 Desglose de mermas por Empresa, Cultivo y Día")
+        st.dataframe(desglose_mermas(df_filtrado), use_container_width=True)
+
+
+panel_cosecha(filtros)
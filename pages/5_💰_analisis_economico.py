@@ -4,7 +4,13 @@ import plotly.express as px
 from io import BytesIO
 import os
 import json
-import numpy as np
+
+from utils.artefactos import cargar_manifiesto, leer_artefacto, particion
+from utils.calculos import PARAMETROS_DEFECTO, costos_para_economico, resumen_economico
+from utils.carga import cargar_en_paralelo, costos_con_produccion, leer_costos_economico, leer_produccion_economico
+from utils.claves import cargar_alias
+from utils.esquemas import unir_cuarentenas
+from utils.memoria import cache_de_sesion, en_cache, huella, texto_memoria, vista
 
 
 st.set_page_config(page_title="Análisis Económico por Especie", layout="wide")
@@ -25,34 +31,32 @@ def guardar_parametros(parametros_actualizados):
     with open(PARAMS_FILE, "w") as f:
         json.dump(parametros_actualizados, f, indent=2)
 
-@st.cache_data
-def cargar_produccion():
-    df = pd.read_excel("data/Produccion Por Cultivo.xlsx", sheet_name="Hoja1")
-    df.columns = df.columns.str.strip()
-    df = df.rename(columns={
-        "Cultivo": "cultivo",
-        "Especie": "especie",
-        "Campo": "campo",
-        "Superficie (ha)": "sup_total",
-        "Sup. Cosechada (ha)": "sup_cosechada",
-        "Ton Chacra": "ton_chacra",
-        "Rinde Acondicionado (tn/ha)": "rinde_ha"
-    })
-    for col in ["rinde_ha", "ton_chacra", "sup_cosechada"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
-
-@st.cache_data
-def cargar_costos():
-    df = pd.read_excel("data/InformeOtRealizadas_al_2025-07-19.xlsx")
-    df.columns = df.columns.str.strip()
-    df = df.rename(columns={"Cultivo": "cultivo", "Total": "costo_total", "Tipo Insumo": "tipo"})
-    df["costo_total"] = pd.to_numeric(df["costo_total"], errors="coerce")
-    return df
+# Una sola copia por proceso, compartida por todas las sesiones: no se modifica
+@st.cache_resource
+def cargar_datos():
+    # Producción y costos son independientes: se parsean en paralelo
+    datos, errores = cargar_en_paralelo({"produccion": leer_produccion_economico, "costos": leer_costos_economico})
+    if not errores:
+        # Costos de cultivos que no figuran en producción no entran al análisis
+        df_costos, cuarentena = datos["costos"]
+        df_costos, cuarentena_ref, _ = costos_con_produccion(df_costos, datos["produccion"][0],
+                                                             cargar_alias("cultivo"))
+        datos["costos"] = (df_costos, unir_cuarentenas(cuarentena, cuarentena_ref))
+    return datos, errores
 
 # Cargar datos
-df_prod = cargar_produccion()
-df_costos = cargar_costos()
+datos, errores = cargar_datos()
+if errores:
+    cargar_datos.clear()
+    for nombre, error in errores.items():
+        st.error(f"No se pudo cargar '{nombre}': {error}")
+    st.stop()
+
+df_prod, cuarentena_prod = datos["produccion"]
+df_costos, cuarentena_costos = datos["costos"]
+cuarentena = unir_cuarentenas(cuarentena_prod, cuarentena_costos)
+
+cache = cache_de_sesion(st.session_state)
 
 # Filtros en sidebar
 st.sidebar.header("🔎 Filtros de análisis")
@@ -65,39 +69,23 @@ empresa_seleccionada = st.sidebar.selectbox("Empresa", sorted(empresa_opciones))
 campo_seleccionado = st.sidebar.multiselect("Campo", sorted(campo_opciones), default=campo_opciones)
 especies_seleccionadas = st.sidebar.multiselect("Especie", sorted(especie_opciones), default=especie_opciones)
 
-# Aplicar filtros a df_prod
-df_prod = df_prod[
-    (df_prod["campo"].isin(campo_seleccionado)) &
-    (df_prod["especie"].isin(especies_seleccionadas))
-]
-
-# También filtrar costos a los cultivos resultantes
-df_costos = df_costos[df_costos["cultivo"].isin(df_prod["cultivo"])]
-
-
-# Agrupación de costos por cultivo
-df_costos_agg = df_costos.groupby(["cultivo", "tipo"])["costo_total"].sum().reset_index()
-df_costos_totales = df_costos.groupby("cultivo")["costo_total"].sum().reset_index()
-
-# Merge con producción
-df = pd.merge(df_prod, df_costos_totales, on="cultivo", how="left")
-df["costo_total"] = df["costo_total"].fillna(0)
+# Filtros de df_prod como máscara: df_prod y df_costos no se reemplazan por copias filtradas
+mascara = (df_prod["campo"].isin(campo_seleccionado) & df_prod["especie"].isin(especies_seleccionadas)).to_numpy()
+sin_filtros = mascara.all()
 
 st.title("💰 Análisis Económico por Especie")
+if not cuarentena.empty:
+    with st.expander(f"⚠️ {len(cuarentena)} filas en cuarentena (no se usan en el análisis)"):
+        st.dataframe(cuarentena, use_container_width=True)
 
-especies_unicas = df["especie"].unique()
+especies_unicas = df_prod.loc[mascara, "especie"].unique()
 parametros_json = cargar_parametros()
 parametros = {}
 
 st.sidebar.header("📥 Ingresá parámetros por especie")
 
 for especie in especies_unicas:
-    especie_params = parametros_json.get(especie, {
-        "arrendamiento": 360.0,
-        "flete": 17.0,
-        "precio_bruto": 360.0,
-        "precio_neto": 352.0
-    })
+    especie_params = parametros_json.get(especie, PARAMETROS_DEFECTO)
 
     with st.sidebar.expander(f"⚙️ Parámetros - {especie}"):
         arr = st.number_input(f"Arrendamiento (USD/ha) - {especie}", min_value=0.0, value=especie_params["arrendamiento"], step=1.0, key=f"arr_{especie}")
@@ -117,68 +105,23 @@ if st.sidebar.button("💾 Guardar parámetros"):
     guardar_parametros(parametros)
     st.sidebar.success("Parámetros guardados correctamente ✅")
 
-# Cálculos económicos
-resultados = []
-
-for _, row in df.iterrows():
-    especie = row["especie"]
-    cultivo = row["cultivo"]
-    sup = row["sup_cosechada"]
-    rinde = row["rinde_ha"]
-    costo_total = row["costo_total"]
-
-    p = parametros.get(especie, parametros_json.get(especie, {
-        "arrendamiento": 360.0,
-        "flete": 17.0,
-        "precio_bruto": 360.0,
-        "precio_neto": 352.0
-    }))
-
-    ingreso_bruto_ha = rinde * p["precio_bruto"]
-    ingreso_neto_ha = rinde * p["precio_neto"]
-    flete_ha = rinde * p["flete"]
-    ingreso_final_ha = ingreso_neto_ha - flete_ha - p["arrendamiento"] - (costo_total / sup if sup > 0 else 0)
-    ingreso_final_total = ingreso_final_ha * sup
-
-    resultados.append({
-        "Especie": especie,
-        "Cultivo": cultivo,
-        "Campo": row["campo"],
-        "Sup. Cosechada": sup,
-        "Rinde (tn/ha)": rinde,
-        "Ingreso Bruto (USD/ha)": ingreso_bruto_ha,
-        "Ingreso Neto (USD/ha)": ingreso_neto_ha,
-        "Costo Total OC (USD)": costo_total,
-        "Flete (USD/ha)": flete_ha,
-        "Arrendamiento (USD/ha)": p["arrendamiento"],
-        "Ingreso Final (USD/ha)": ingreso_final_ha,
-        "Ingreso Final Total (USD)": ingreso_final_total,
-
-        "Precio Neto (USD/tn)": p["precio_neto"],
-        "Flete (USD/tn)": p["flete"]
-    })
-
-resumen_df = pd.DataFrame(resultados)
-
-# Desglose de costos
-resumen_df["Costo Unitario (USD/ha)"] = resumen_df["Costo Total OC (USD)"] / resumen_df["Sup. Cosechada"]
-resumen_df["Costo Total (USD/ha)"] = (
-    resumen_df["Costo Unitario (USD/ha)"]
-    + resumen_df["Arrendamiento (USD/ha)"]
-    + resumen_df["Flete (USD/ha)"]
-)
-resumen_df["Margen (USD/ha)"] = resumen_df["Ingreso Neto (USD/ha)"] - resumen_df["Costo Total (USD/ha)"]
-
-# NUEVO: rinde de indiferencia
-resumen_df["Costos Fijos (USD/ha)"] = resumen_df["Costo Unitario (USD/ha)"] + resumen_df["Arrendamiento (USD/ha)"]
-resumen_df["Denominador (USD/tn)"] = resumen_df["Precio Neto (USD/tn)"] - resumen_df["Flete (USD/tn)"]
-
-resumen_df["Rinde Indiferencia (tn/ha)"] = np.where(
-    resumen_df["Denominador (USD/tn)"] > 0,
-    resumen_df["Costos Fijos (USD/ha)"] / resumen_df["Denominador (USD/tn)"],
-    np.nan
-)
-resumen_df["Rinde Indiferencia (kg/ha)"] = resumen_df["Rinde Indiferencia (tn/ha)"] * 1000
+# Cálculos económicos: sin filtros y con los mismos parámetros sirve lo precalculado
+resumen_df = df_costos_agg = None
+manifiesto = cargar_manifiesto() if sin_filtros else None
+if manifiesto is not None and all(
+    parametros[especie] == manifiesto["parametros"].get(especie, PARAMETROS_DEFECTO) for especie in especies_unicas
+):
+    resumen_df = leer_artefacto("resumen_economico", particion(), manifiesto=manifiesto)
+    df_costos_agg = leer_artefacto("costos_desglosados", particion(), manifiesto=manifiesto)
+
+if resumen_df is None or df_costos_agg is None:
+    clave_filtros = huella(mascara)
+    resumen_df = en_cache(
+        cache, ("resumen_economico", clave_filtros, json.dumps(parametros, sort_keys=True)),
+        lambda: resumen_economico(vista(df_prod, mascara), df_costos, {**parametros_json, **parametros})
+    )
+    df_costos_agg, _ = en_cache(cache, ("costos_para_economico", clave_filtros),
+                                lambda: costos_para_economico(vista(df_prod, mascara), df_costos))
 
 cultivos_ordenados = resumen_df.sort_values("Ingreso Final Total (USD)", ascending=False)["Cultivo"].tolist()
 
@@ -210,7 +153,7 @@ stack_data = resumen_df[[
     "Arrendamiento (USD/ha)",
     "Flete (USD/ha)",
     "Margen (USD/ha)"
-]].copy()
+]]
 
 stack_data = stack_data.melt(id_vars="Cultivo", 
                               var_name="Componente", 
@@ -264,3 +207,7 @@ st.download_button(
     file_name="analisis_economico_especie.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 )
+
+# Memoria de la sesión (resultados guardados) y del proceso
+valor, ayuda = texto_memoria(cache)
+st.sidebar.metric("🧠 Memoria de la sesión", valor, help=ayuda)
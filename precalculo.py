@@ -0,0 +1,184 @@
+"""Precalcula los resúmenes de las páginas sin abrir Streamlit.
+
+Pensado para correr de noche (cron) desde la raíz del proyecto:
+
+    python precalculo.py
+
+Lee todas las fuentes, calcula los resúmenes de costos, presupuesto vs
+ejecutado y análisis económico para el total y para cada empresa / gestión,
+y los deja en data/precalculado junto con un manifiesto con las entradas
+usadas y los tiempos. Las páginas leen esos resultados mientras los
+archivos de origen no cambien. La cosecha no se precalcula: el reporte la
+arma a partir de las órdenes que llegan durante el día (utils/ingesta.py).
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from functools import partial
+
+from utils.artefactos import (DIRECTORIO_ARTEFACTOS, TODAS, firma_archivo, guardar_artefacto,
+                              guardar_manifiesto, particion)
+from utils.calculos import (costos_para_economico, costos_por_tipo_insumo, presupuesto_vs_ejecutado,
+                            resumen_costos_por_cultivo, resumen_economico)
+from utils.carga import (FUENTES, RUTA_COSTOS, RUTA_COSTOS_ECONOMICO, RUTA_ORDENES_CARGA, RUTA_PRESUPUESTO,
+                         RUTA_PRODUCCION, TIMEOUT_POR_ARCHIVO, cargar_en_paralelo, costos_con_produccion)
+from utils.claves import (aprender_alias, cargar_alias, construir_indice, guardar_alias, resolver,
+                          sin_coincidencia)
+from utils.esquemas import unir_cuarentenas
+
+PARAMS_FILE = "data/parametros_por_especie.json"
+
+# Los parámetros no van acá: se guardan en el manifiesto y la página los compara
+ENTRADAS = [RUTA_COSTOS, RUTA_COSTOS_ECONOMICO, RUTA_PRESUPUESTO, RUTA_PRODUCCION, RUTA_ORDENES_CARGA]
+
+
+def _cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def _particiones(df, col_empresa, col_gestion):
+    """Total, cada empresa y cada empresa / gestión."""
+    yield particion(), df
+    if col_empresa is not None:
+        for empresa, grupo in df.groupby(col_empresa):
+            yield particion(empresa), grupo
+    for claves, grupo in df.groupby([c for c in (col_empresa, col_gestion) if c is not None]):
+        if col_empresa is None:
+            yield particion(TODAS, claves[0]), grupo
+        else:
+            yield particion(*claves), grupo
+
+
+def calcular_costos(df, df_presupuesto, alias_tipo_insumo):
+    return {
+        "costos_por_cultivo": resumen_costos_por_cultivo(df),
+        "costos_por_tipo_insumo": costos_por_tipo_insumo(df),
+        "presupuesto_vs_ejecutado": presupuesto_vs_ejecutado(df, df_presupuesto, alias_tipo_insumo),
+    }
+
+
+def calcular_economico(df_prod, df_costos, parametros):
+    return {
+        "resumen_economico": resumen_economico(df_prod, df_costos, parametros),
+        "costos_desglosados": costos_para_economico(df_prod, df_costos)[0],
+    }
+
+
+def coincidencias_aproximadas(resolucion):
+    """Coincidencias por similitud, para revisarlas en el manifiesto antes de confirmarlas."""
+    aproximadas = resolucion[resolucion["metodo"] == "aproximado"]
+    return [{"nombre": nombre, "canonico": canonico, "similitud": round(similitud, 3)}
+            for nombre, canonico, similitud in aproximadas[["nombre", "canonico", "similitud"]].itertuples(index=False)]
+
+
+def confirmar_alias(dominio, resolucion):
+    """Pasa las coincidencias aproximadas a la tabla de alias (solo con --confirmar-alias)."""
+    alias = cargar_alias(dominio)
+    cantidad = len(alias)
+    aprender_alias(alias, resolucion)
+    if len(alias) != cantidad:
+        guardar_alias(dominio, alias)
+
+
+def armar_tareas(datos, parametros, alias_tipo_insumo):
+    tareas = {}
+    for clave, df in _particiones(datos["costos"], "Empresa", "Gestión"):
+        tareas[("costos", clave)] = partial(_cronometrar, calcular_costos, df, datos["presupuesto"],
+                                            alias_tipo_insumo)
+
+    # La producción no trae empresa: se parte solo por gestión
+    for clave, df in _particiones(datos["produccion_economico"], None, "Gestión"):
+        tareas[("economico", clave)] = partial(_cronometrar, calcular_economico, df,
+                                               datos["costos_economico"], parametros)
+    return tareas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--salida", default=DIRECTORIO_ARTEFACTOS, help="Directorio de los resultados")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_POR_ARCHIVO,
+                        help="Segundos máximos por archivo y por cálculo")
+    parser.add_argument("--hilos", action="store_true", help="Usar hilos en lugar de procesos")
+    parser.add_argument("--confirmar-alias", action="store_true",
+                        help="Guardar como alias las coincidencias aproximadas (revisarlas antes en el manifiesto)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    # Firmas antes de leer: si un archivo cambia durante la corrida, el manifiesto queda vencido
+    entradas = {ruta: firma_archivo(ruta) for ruta in ENTRADAS}
+    with open(PARAMS_FILE, "r") as f:
+        parametros = json.load(f)
+
+    tareas_carga = {nombre: partial(_cronometrar, lector) for nombre, lector in FUENTES.items()}
+    cargados, errores = cargar_en_paralelo(tareas_carga, timeout=args.timeout, usar_procesos=not args.hilos)
+    if errores:
+        for nombre, error in errores.items():
+            print(f"No se pudo cargar '{nombre}': {error}")
+        return 1
+    datos = {nombre: df for nombre, ((df, _), _) in cargados.items()}
+    cuarentenas = {nombre: cuarentena for nombre, ((_, cuarentena), _) in cargados.items()}
+
+    # Claves entre fuentes: lo resuelto por similitud se informa en el manifiesto
+    # y solo pasa a la tabla de alias cuando se confirma
+    datos["costos_economico"], cuarentena_ref, resolucion_cultivo = costos_con_produccion(
+        datos["costos_economico"], datos["produccion_economico"], cargar_alias("cultivo")
+    )
+    cuarentenas["costos_economico"] = unir_cuarentenas(cuarentenas["costos_economico"], cuarentena_ref)
+    resolucion_tipo = resolver(construir_indice(datos["costos"]["Tipo Insumo"], cargar_alias("tipo_insumo")),
+                               datos["presupuesto"]["Tipo Insumo"])
+    if args.confirmar_alias:
+        confirmar_alias("cultivo", resolucion_cultivo)
+        confirmar_alias("tipo_insumo", resolucion_tipo)
+    alias_tipo_insumo = cargar_alias("tipo_insumo")
+
+    fin_carga = time.perf_counter()
+
+    tareas = armar_tareas(datos, parametros, alias_tipo_insumo)
+    resultados, errores = cargar_en_paralelo(tareas, timeout=args.timeout, usar_procesos=not args.hilos)
+
+    artefactos = {"cuarentena": {
+        nombre: {"archivo": guardar_artefacto(cuarentena, "cuarentena", nombre, args.salida), "filas": len(cuarentena)}
+        for nombre, cuarentena in cuarentenas.items()
+    }}
+    for (familia, clave), (tablas, segundos) in resultados.items():
+        for nombre, df in tablas.items():
+            artefactos.setdefault(nombre, {})[clave] = {
+                "archivo": guardar_artefacto(df, nombre, clave, args.salida),
+                "filas": len(df),
+                "segundos": round(segundos, 4),
+            }
+
+    guardar_manifiesto({
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "entradas": entradas,
+        "parametros": parametros,
+        "tiempos": {
+            "carga": {nombre: round(segundos, 4) for nombre, (_, segundos) in cargados.items()},
+            "carga_total": round(fin_carga - inicio, 4),
+            "total": round(time.perf_counter() - inicio, 4),
+        },
+        "cuarentena": {nombre: len(cuarentena) for nombre, cuarentena in cuarentenas.items()},
+        "coincidencias_aproximadas": {
+            "cultivo": coincidencias_aproximadas(resolucion_cultivo),
+            "tipo_insumo": coincidencias_aproximadas(resolucion_tipo),
+        },
+        "claves_sin_coincidencia": {
+            "cultivo": sin_coincidencia(resolucion_cultivo),
+            "tipo_insumo": sin_coincidencia(resolucion_tipo),
+        },
+        "errores": {f"{familia} {clave}": error for (familia, clave), error in errores.items()},
+        "artefactos": artefactos,
+    }, args.salida)
+
+    print(f"{sum(len(p) for p in artefactos.values())} resultados en {args.salida} "
+          f"({time.perf_counter() - inicio:.1f} s)")
+    for (familia, clave), error in errores.items():
+        print(f"Error en {familia} {clave}: {error}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+# Resultados precalculados por `precalculo.py`, listos para que los lean las páginas
+DIRECTORIO_ARTEFACTOS = "data/precalculado"
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+TODAS = "*"
+
+
+def particion(empresa=TODAS, gestion=TODAS):
+    return f"{empresa}|{gestion}"
+
+
+def firma_archivo(ruta):
+    # Tamaño y fecha de modificación alcanzan para saber si el archivo cambió
+    info = os.stat(ruta)
+    return {"tamano": info.st_size, "modificado": info.st_mtime}
+
+
+def _nombre_archivo(nombre, clave):
+    legible = re.sub(r"[^0-9A-Za-z]+", "_", clave).strip("_") or "todas"
+    sufijo = hashlib.sha1(clave.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(nombre, f"{legible}_{sufijo}.pkl")
+
+
+def guardar_artefacto(df, nombre, clave, directorio=DIRECTORIO_ARTEFACTOS):
+    archivo = _nombre_archivo(nombre, clave)
+    ruta = os.path.join(directorio, archivo)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    df.to_pickle(ruta)
+    return archivo
+
+
+def guardar_manifiesto(manifiesto, directorio=DIRECTORIO_ARTEFACTOS):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, NOMBRE_MANIFIESTO)
+    # Se escribe aparte y se reemplaza para que las páginas nunca lean uno a medias
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def cargar_manifiesto(directorio=DIRECTORIO_ARTEFACTOS):
+    """Devuelve el manifiesto si existe y sus entradas no cambiaron; si no, None."""
+    ruta = os.path.join(directorio, NOMBRE_MANIFIESTO)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    for ruta_entrada, firma in manifiesto.get("entradas", {}).items():
+        if not os.path.exists(ruta_entrada) or firma_archivo(ruta_entrada) != firma:
+            return None
+    return manifiesto
+
+
+def leer_artefacto(nombre, clave=particion(), directorio=DIRECTORIO_ARTEFACTOS, manifiesto=None):
+    """DataFrame precalculado, o None si no existe o está desactualizado."""
+    manifiesto = manifiesto or cargar_manifiesto(directorio)
+    if manifiesto is None:
+        return None
+    artefacto = manifiesto.get("artefactos", {}).get(nombre, {}).get(clave)
+    if artefacto is None:
+        return None
+    return pd.read_pickle(os.path.join(directorio, artefacto["archivo"]))
+
+
+def precalculado_o_calcular(nombre, clave, calcular, *args):
+    """Usa el resultado precalculado de `clave` si está vigente; si no, lo calcula.
+
+    Con `clave=None` (filtros que no corresponden a ninguna partición) siempre calcula.
+    """
+    df = leer_artefacto(nombre, clave) if clave is not None else None
+    return df if df is not None else calcular(*args)
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from utils.claves import construir_indice, mapear
+
+# Parámetros económicos por defecto para especies sin valores guardados
+PARAMETROS_DEFECTO = {
+    "arrendamiento": 360.0,
+    "flete": 17.0,
+    "precio_bruto": 360.0,
+    "precio_neto": 352.0
+}
+
+
+def _superficie_por_cultivo(df):
+    # Superficie del cultivo; el esquema de costos ya garantiza que sea positiva
+    return df.groupby("Cultivo")["Superficie"].first()
+
+
+def resumen_costos_por_cultivo(df):
+    superficie = _superficie_por_cultivo(df)
+    total = df.groupby("Cultivo")["Total"].sum()
+    resumen = pd.DataFrame({
+        "Cultivo": superficie.index,
+        "Superficie (ha)": superficie.to_numpy(),
+        "Costo Total (USD)": total.reindex(superficie.index).to_numpy()
+    })
+    resumen["Costo USD/ha"] = resumen["Costo Total (USD)"] / resumen["Superficie (ha)"]
+    return resumen
+
+
+def costos_por_tipo_insumo(df):
+    superficie = _superficie_por_cultivo(df)
+    df = df[df["Cultivo"].isin(superficie.index)]
+    resumen = df.groupby(["Cultivo", "Tipo Insumo"])["Total"].sum().reset_index()
+    resumen["USD/ha"] = resumen["Total"] / resumen["Cultivo"].map(superficie)
+    return resumen[["Cultivo", "Tipo Insumo", "USD/ha"]]
+
+
+def presupuesto_vs_ejecutado(df, df_presupuesto, alias=None):
+    # Homogeneizar nombres para merge: los tipos de insumo de ambos lados se
+    # llevan a los nombres de las OT; los que solo están presupuestados quedan igual
+    indice = construir_indice(df["Tipo Insumo"], alias)
+    tipos_ejecutados, _ = mapear(indice, df["Tipo Insumo"])
+    tipos_presupuestados, _ = mapear(indice, df_presupuesto["Tipo Insumo"])
+    df = df.assign(**{"Tipo Insumo": tipos_ejecutados})
+    presupuesto = df_presupuesto.assign(
+        **{"Tipo Insumo": tipos_presupuestados.fillna(df_presupuesto["Tipo Insumo"])}
+    )
+
+    comparativo = []
+    superficie = _superficie_por_cultivo(df)
+    df = df[df["Cultivo"].isin(superficie.index)]
+    usd_ha = df.groupby(["Especie", "Cultivo", "Tipo Insumo"])["Total"].sum()
+    usd_ha = usd_ha / usd_ha.index.get_level_values("Cultivo").map(superficie)
+
+    for especie, ejecutado in usd_ha.groupby(level="Especie"):
+        # Promedio de USD/ha entre los cultivos de la especie
+        ejecutado_df = (
+            ejecutado.unstack("Cultivo").mean(axis=1)
+            .droplevel("Especie").rename("USD_ejecutado").reset_index()
+        )
+        ejecutado_df["Especie"] = especie
+
+        presup_agrupado = (
+            presupuesto[presupuesto["Especie"] == especie]
+            .groupby("Tipo Insumo")["USD_presupuestado"].sum().reset_index()
+        )
+
+        comparado = pd.merge(ejecutado_df, presup_agrupado, on="Tipo Insumo", how="outer")
+        comparado["Especie"] = especie
+        comparado = comparado.fillna(0)
+        comparado["Diferencia"] = comparado["USD_ejecutado"] - comparado["USD_presupuestado"]
+        presupuestado = comparado["USD_presupuestado"].where(comparado["USD_presupuestado"] > 0)
+        comparado["% Ejecutado"] = (comparado["USD_ejecutado"] / presupuestado * 100).fillna(0).round(1)
+        comparativo.append(comparado)
+
+    if not comparativo:
+        return pd.DataFrame(columns=["Tipo Insumo", "USD_ejecutado", "Especie", "USD_presupuestado",
+                                     "Diferencia", "% Ejecutado"])
+    return pd.concat(comparativo, ignore_index=True)
+
+
+def resumen_diario_cosecha(df):
+    resumen_diario = df.groupby("fecha").agg({
+        "kg_origen": "sum",
+        "kg_final": "sum",
+        "dif_kg": "sum",
+        "merma_esperada_kg": "sum",
+        "merma_no_explicada_kg": "sum"
+    }).reset_index()
+    resumen_diario["avance_acumulado"] = resumen_diario["kg_final"].cumsum()
+    return resumen_diario
+
+
+def resumen_cosecha_por_cultivo(df):
+    resumen_cultivo = df.groupby(["empresa", "cultivo"]).agg({
+        "kg_origen": "sum",
+        "kg_final": "sum",
+        "dif_kg": "sum",
+        "merma_esperada_kg": "sum",
+        "merma_no_explicada_kg": "sum"
+    }).reset_index()
+    resumen_cultivo["dif_pct"] = resumen_cultivo["dif_kg"] / resumen_cultivo["kg_origen"]
+    return resumen_cultivo
+
+
+def costos_para_economico(df_prod, df_costos):
+    """Costos de los cultivos de `df_prod`: desglosados por tipo y totales."""
+    # Los cultivos ajenos quedan con clave vacía y el groupby los descarta, sin copiar df_costos
+    cultivo = df_costos["cultivo"].where(df_costos["cultivo"].isin(df_prod["cultivo"]))
+    df_costos_agg = df_costos.groupby([cultivo, df_costos["tipo"]])["costo_total"].sum().reset_index()
+    df_costos_totales = df_costos.groupby(cultivo)["costo_total"].sum().reset_index()
+    return df_costos_agg, df_costos_totales
+
+
+def resumen_economico(df_prod, df_costos, parametros):
+    """Márgenes e ingreso final por cultivo.
+
+    `parametros` es un dict especie -> {arrendamiento, flete, precio_bruto,
+    precio_neto}; las especies que no figuran usan PARAMETROS_DEFECTO.
+    """
+    _, df_costos_totales = costos_para_economico(df_prod, df_costos)
+    df = pd.merge(df_prod, df_costos_totales, on="cultivo", how="left")
+    df["costo_total"] = df["costo_total"].fillna(0)
+
+    especies = df["especie"].unique()
+    p = pd.DataFrame(
+        [parametros.get(especie, PARAMETROS_DEFECTO) for especie in especies],
+        index=especies, columns=list(PARAMETROS_DEFECTO)
+    ).reindex(df["especie"]).set_index(df.index)
+    sup = df["sup_cosechada"]
+    rinde = df["rinde_ha"]
+    # El esquema de producción garantiza sup_cosechada > 0
+    costo_ha = df["costo_total"] / sup
+
+    resumen_df = pd.DataFrame({
+        "Especie": df["especie"],
+        "Cultivo": df["cultivo"],
+        "Campo": df["campo"],
+        "Sup. Cosechada": sup,
+        "Rinde (tn/ha)": rinde,
+        "Ingreso Bruto (USD/ha)": rinde * p["precio_bruto"],
+        "Ingreso Neto (USD/ha)": rinde * p["precio_neto"],
+        "Costo Total OC (USD)": df["costo_total"],
+        "Flete (USD/ha)": rinde * p["flete"],
+        "Arrendamiento (USD/ha)": p["arrendamiento"],
+    })
+    resumen_df["Ingreso Final (USD/ha)"] = (
+        resumen_df["Ingreso Neto (USD/ha)"] - resumen_df["Flete (USD/ha)"]
+        - resumen_df["Arrendamiento (USD/ha)"] - costo_ha
+    )
+    resumen_df["Ingreso Final Total (USD)"] = resumen_df["Ingreso Final (USD/ha)"] * sup
+    resumen_df["Precio Neto (USD/tn)"] = p["precio_neto"]
+    resumen_df["Flete (USD/tn)"] = p["flete"]
+    resumen_df = resumen_df.reset_index(drop=True)
+
+    # Desglose de costos
+    resumen_df["Costo Unitario (USD/ha)"] = resumen_df["Costo Total OC (USD)"] / resumen_df["Sup. Cosechada"]
+    resumen_df["Costo Total (USD/ha)"] = (
+        resumen_df["Costo Unitario (USD/ha)"]
+        + resumen_df["Arrendamiento (USD/ha)"]
+        + resumen_df["Flete (USD/ha)"]
+    )
+    resumen_df["Margen (USD/ha)"] = resumen_df["Ingreso Neto (USD/ha)"] - resumen_df["Costo Total (USD/ha)"]
+
+    # Rinde de indiferencia
+    resumen_df["Costos Fijos (USD/ha)"] = resumen_df["Costo Unitario (USD/ha)"] + resumen_df["Arrendamiento (USD/ha)"]
+    resumen_df["Denominador (USD/tn)"] = resumen_df["Precio Neto (USD/tn)"] - resumen_df["Flete (USD/tn)"]
+
+    resumen_df["Rinde Indiferencia (tn/ha)"] = np.where(
+        resumen_df["Denominador (USD/tn)"] > 0,
+        resumen_df["Costos Fijos (USD/ha)"] / resumen_df["Denominador (USD/tn)"],
+        np.nan
+    )
+    resumen_df["Rinde Indiferencia (kg/ha)"] = resumen_df["Rinde Indiferencia (tn/ha)"] * 1000
+    return resumen_df
@@ -0,0 +1,274 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from utils.claves import construir_indice, mapear
+from utils.esquemas import validar, validar_referencia
+from utils.lanzador import contexto_trabajadores
+
+# Rutas de los archivos de origen
+RUTA_COSTOS = "data/InformeOtRealizadas_al_2025-07-18.xlsx"
+RUTA_COSTOS_ECONOMICO = "data/InformeOtRealizadas_al_2025-07-19.xlsx"
+RUTA_PRESUPUESTO = "data/CultivosPresupuestados.xlsx"
+RUTA_PRODUCCION = "data/Produccion Por Cultivo.xlsx"
+RUTA_ORDENES_CARGA = "data/ordenes de carga.xlsx"
+
+TIMEOUT_POR_ARCHIVO = 60
+
+
+# Cada lector devuelve `(validos, cuarentena)`: las columnas ya vienen
+# convertidas por su esquema (utils/esquemas.py) y las filas que no lo cumplen
+# quedan aparte con el motivo, en lugar de convertirse en NaN.
+
+def leer_costos(ruta=RUTA_COSTOS):
+    df = pd.read_excel(ruta, sheet_name="Worksheet")
+    df.columns = df.columns.str.strip()
+    df, cuarentena = validar(df, "costos")
+    df["USD_ha"] = df["Total"] / df["Superficie"]
+    return df, cuarentena
+
+
+def leer_presupuesto(ruta=RUTA_PRESUPUESTO):
+    df = pd.read_excel(ruta, sheet_name="Hoja1", index_col=None)
+    df.columns = df.columns.str.strip()
+    df, cuarentena = validar(df, "presupuesto")
+    df["Total"] = df["TotalUSD"]
+    df["USD_presupuestado"] = df["TotalUSD"]
+    df["Tipo Insumo"] = df["TipoInsumo"]
+    return df, cuarentena
+
+
+def leer_produccion(ruta=RUTA_PRODUCCION):
+    df = pd.read_excel(ruta, sheet_name="Hoja1")
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={
+        "Cultivo": "cultivo",
+        "Especie": "especie",
+        "Campo": "campo",
+        "Superficie (ha)": "sup_total",
+        "Sup. Cosechada (ha)": "sup_cosechada",
+        "% Avance": "avance",
+        "Ton Chacra": "ton_chacra",
+        "Rinde Chacra (tn/ha)": "rinde_chacra",
+        "Ton Destino": "ton_destino",
+        "Rinde Destino (tn/ha)": "rinde_destino",
+        "Ton Acondicionado": "ton_acondicionado",
+        "Rinde Acondicionado (tn/ha)": "rinde_acondicionado"
+    })
+    return validar(df, "produccion")
+
+
+def leer_produccion_economico(ruta=RUTA_PRODUCCION):
+    df = pd.read_excel(ruta, sheet_name="Hoja1")
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={
+        "Cultivo": "cultivo",
+        "Especie": "especie",
+        "Campo": "campo",
+        "Superficie (ha)": "sup_total",
+        "Sup. Cosechada (ha)": "sup_cosechada",
+        "Ton Chacra": "ton_chacra",
+        "Rinde Acondicionado (tn/ha)": "rinde_ha"
+    })
+    return validar(df, "produccion_economico")
+
+
+def leer_costos_economico(ruta=RUTA_COSTOS_ECONOMICO):
+    df = pd.read_excel(ruta)
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={"Cultivo": "cultivo", "Total": "costo_total", "Tipo Insumo": "tipo"})
+    return validar(df, "costos_economico")
+
+
+def _preparar_ordenes(df):
+    df.columns = df.columns.str.strip()
+    # "Nº Orden" a veces llega como "NÂº Orden"
+    df = df.rename(columns=lambda c: "orden" if re.fullmatch(r"N\S*\s*Orden", c) else c)
+    df = df.rename(columns={
+        "Fecha": "fecha",
+        "Empresa": "empresa",
+        "Cultivo": "cultivo",
+        "Kg Origen": "kg_origen",
+        "Kg Destino": "kg_destino",
+        "Kg Final": "kg_final",
+        "Humedad": "humedad",
+        "Diferencia Kg": "dif_kg",
+        "Diferencia %": "dif_pct"
+    })
+    return validar(df, "ordenes_carga")
+
+
+def leer_ordenes_carga(ruta=RUTA_ORDENES_CARGA):
+    return _preparar_ordenes(pd.read_excel(ruta, sheet_name=0))
+
+
+def leer_lote_ordenes(ruta):
+    """Lote de órdenes de carga en Excel, CSV o JSON, con las columnas del Excel."""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        df = pd.read_csv(ruta)
+    elif extension == ".json":
+        df = pd.read_json(ruta, orient="records", convert_dates=False)
+        if pd.api.types.is_numeric_dtype(df.get("Fecha")):
+            # JSON escrito por pandas: milisegundos desde 1970
+            df["Fecha"] = pd.to_datetime(df["Fecha"], unit="ms")
+    else:
+        df = pd.read_excel(ruta, sheet_name=0)
+    return _preparar_ordenes(df)
+
+
+def costos_con_produccion(df_costos, df_prod, alias=None):
+    """Integridad referencial entre costos y producción.
+
+    Los cultivos de costos se llevan al nombre que tienen en producción
+    (tildes, mayúsculas, espacios o alias distintos) y los que no tienen
+    producción van a la cuarentena. Devuelve `(validos, cuarentena, resolucion)`.
+    """
+    indice = construir_indice(df_prod["cultivo"], alias)
+    cultivos, resolucion = mapear(indice, df_costos["cultivo"])
+    df_costos = df_costos.assign(cultivo=cultivos.fillna(df_costos["cultivo"]))
+    validos, cuarentena = validar_referencia(df_costos, "cultivo", df_prod["cultivo"], "costos_economico",
+                                             "cultivo sin producción")
+    return validos, cuarentena, resolucion
+
+
+# Todas las fuentes conocidas, para precargarlas juntas
+FUENTES = {
+    "costos": leer_costos,
+    "presupuesto": leer_presupuesto,
+    "produccion": leer_produccion,
+    "produccion_economico": leer_produccion_economico,
+    "costos_economico": leer_costos_economico,
+    "ordenes_carga": leer_ordenes_carga,
+}
+
+
+def _listo():
+    return True
+
+
+def _en_hilo(funcion):
+    # Hilo daemon: un lector colgado no impide que el proceso termine
+    futuro = Future()
+
+    def correr():
+        if not futuro.set_running_or_notify_cancel():
+            return
+        try:
+            futuro.set_result(funcion())
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=correr, daemon=True).start()
+    return futuro
+
+
+def _nuevo_pool(workers):
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=contexto_trabajadores)
+    # Se arrancan todos los workers ahora, para que el arranque no cuente
+    # en el plazo de la primera tarea de cada uno
+    wait([pool.submit(_listo) for _ in range(workers)])
+    return pool
+
+
+def _cerrar_pool(pool):
+    # shutdown no detiene un lector colgado: sus procesos se terminan a mano
+    for proceso in list((pool._processes or {}).values()):
+        proceso.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def cargar_en_paralelo(tareas, timeout=TIMEOUT_POR_ARCHIVO, usar_procesos=True):
+    """Ejecuta varios lectores independientes a la vez.
+
+    `tareas` es un dict nombre -> función sin argumentos obligatorios (debe
+    ser de nivel de módulo para poder enviarla a otro proceso). Devuelve
+    `(datos, errores)`: los DataFrames que se leyeron bien y, para los que
+    fallaron o superaron `timeout` segundos, el mensaje de error. Un archivo
+    con problemas no impide que se carguen los demás.
+
+    Cada llamada arranca sus propios workers y les envía solo tantas tareas
+    como workers tiene, así el plazo corre desde que la tarea empieza. Con un
+    solo CPU los procesos no aceleran nada: las tareas se leen en este
+    proceso, de a una. Con `usar_procesos=False` se leen en hilos, todas a la
+    vez. Un lector que se pasa del plazo en un hilo no se puede detener:
+    sigue hasta terminar, pero ya no se lo espera.
+    """
+    datos, errores = {}, {}
+    if not tareas:
+        return datos, errores
+
+    cpus = os.cpu_count() or 1
+    pool = None
+    if not usar_procesos:
+        capacidad = len(tareas)
+    elif cpus == 1 or contexto_trabajadores is None:
+        capacidad = 1
+    else:
+        capacidad = min(len(tareas), cpus)
+        pool = _nuevo_pool(capacidad)
+
+    pendientes = iter(tareas.items())
+    en_curso = {}
+    # Workers ocupados por un lector que ya superó el plazo
+    colgadas = 0
+    pool_inservible = False
+    while True:
+        while len(en_curso) + colgadas < capacidad:
+            siguiente = next(pendientes, None)
+            if siguiente is None:
+                break
+            nombre, funcion = siguiente
+            try:
+                futuro = pool.submit(funcion) if pool is not None else _en_hilo(funcion)
+            except BrokenProcessPool as e:
+                pool_inservible = True
+                errores[nombre] = f"{type(e).__name__}: {e}"
+                break
+            en_curso[futuro] = (nombre, time.monotonic())
+        if pool_inservible or not en_curso:
+            for nombre, _ in list(en_curso.values()) + list(pendientes):
+                errores[nombre] = "El pool de carga dejó de responder"
+            break
+
+        vence = min(inicio for _, inicio in en_curso.values()) + timeout
+        terminados, _ = wait(en_curso, timeout=max(0.0, vence - time.monotonic()), return_when=FIRST_COMPLETED)
+        for futuro in terminados:
+            nombre, _ = en_curso.pop(futuro)
+            try:
+                datos[nombre] = futuro.result()
+            except BrokenProcessPool as e:
+                pool_inservible = True
+                errores[nombre] = f"{type(e).__name__}: {e}"
+            except Exception as e:
+                errores[nombre] = f"{type(e).__name__}: {e}"
+
+        ahora = time.monotonic()
+        for futuro, (nombre, inicio) in list(en_curso.items()):
+            if ahora - inicio >= timeout:
+                del en_curso[futuro]
+                errores[nombre] = f"Tiempo de carga agotado ({timeout} s)"
+                if pool is not None:
+                    colgadas += 1
+
+        if pool is not None and colgadas >= capacidad:
+            # Todos los workers de esta llamada están colgados: se terminan y
+            # lo que falta va a un pool nuevo
+            _cerrar_pool(pool)
+            pool, colgadas = _nuevo_pool(capacidad), 0
+        if pool_inservible:
+            for nombre, _ in list(en_curso.values()) + list(pendientes):
+                errores[nombre] = "El pool de carga dejó de responder"
+            break
+
+    if pool is not None:
+        if pool_inservible or colgadas:
+            _cerrar_pool(pool)
+        else:
+            pool.shutdown(wait=False)
+    return datos, errores
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Tabla persistida de alias: dominio ("cultivo", "tipo_insumo") -> {clave normalizada: nombre canónico}
+RUTA_ALIAS = "data/alias_claves.json"
+
+UMBRAL_SIMILITUD = 0.8
+# Trigramas presentes en más de esta fracción de los nombres ("24/", "/25")
+# no sirven para elegir candidatos
+FRECUENCIA_MAXIMA_TRIGRAMA = 0.05
+MAX_CANDIDATOS = 20
+
+_NUMEROS = re.compile(r"\d+(?:[./]\d+)*")
+
+
+def _reparar_codificacion(texto):
+    # "MaÃ­z" es "Maíz" guardado en UTF-8 y leído como Latin-1
+    if "Ã" in texto or "Â" in texto:
+        for codificacion in ("cp1252", "latin-1"):
+            try:
+                return texto.encode(codificacion).decode("utf-8")
+            except UnicodeError:
+                continue
+    return texto
+
+
+def normalizar_texto(texto):
+    """Clave de comparación: sin tildes, en minúsculas y con espacios uniformes.
+
+    También une la variante al nombre ("Soja 1,5" -> "soja1.5"), de modo que
+    "Soja1" y "Soja1.5" siguen siendo claves distintas.
+    """
+    texto = _reparar_codificacion(str(texto))
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r"(\d),(\d)", r"\1.\2", texto)
+    texto = re.sub(r"([a-z])\s+(\d)", r"\1\2", texto)
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def _trigramas(clave):
+    relleno = f"  {clave} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def construir_indice(canonicos, alias=None):
+    """Índice de trigramas sobre los nombres canónicos de un dominio.
+
+    `alias` es un dict clave normalizada -> nombre canónico (ver `cargar_alias`).
+    """
+    canonicos = list(pd.unique(pd.Series(list(canonicos)).dropna()))
+    claves = [normalizar_texto(c) for c in canonicos]
+    trigramas = [_trigramas(c) for c in claves]
+
+    postings = defaultdict(list)
+    for i, grams in enumerate(trigramas):
+        for gram in grams:
+            postings[gram].append(i)
+    limite = max(MAX_CANDIDATOS, int(len(canonicos) * FRECUENCIA_MAXIMA_TRIGRAMA))
+    return {
+        "canonicos": canonicos,
+        "por_clave": dict(zip(claves, canonicos)),
+        "alias": dict(alias or {}),
+        "trigramas": trigramas,
+        "numeros": [tuple(_NUMEROS.findall(c)) for c in claves],
+        # Solo se indexan los trigramas poco frecuentes
+        "postings": {gram: np.array(ids) for gram, ids in postings.items() if len(ids) <= limite},
+    }
+
+
+def _mejor_candidato(indice, clave, umbral):
+    grams = _trigramas(clave)
+    listas = [indice["postings"][gram] for gram in grams if gram in indice["postings"]]
+    if not listas:
+        return None, np.nan
+    ids, votos = np.unique(np.concatenate(listas), return_counts=True)
+    candidatos = ids[np.argsort(-votos, kind="stable")[:MAX_CANDIDATOS]]
+    numeros = tuple(_NUMEROS.findall(clave))
+    mejor, mejor_similitud = None, umbral
+    for i in candidatos:
+        # Variante y campaña tienen que coincidir exactamente: Soja1 no es Soja1.5
+        if indice["numeros"][i] != numeros:
+            continue
+        otros = indice["trigramas"][i]
+        similitud = 2 * len(grams & otros) / (len(grams) + len(otros))
+        if similitud >= mejor_similitud:
+            mejor, mejor_similitud = i, similitud
+    if mejor is None:
+        return None, np.nan
+    return indice["canonicos"][mejor], mejor_similitud
+
+
+def resolver(indice, nombres, umbral=UMBRAL_SIMILITUD):
+    """Resuelve cada nombre distinto de `nombres` contra el índice.
+
+    Devuelve un DataFrame con `nombre`, `clave`, `canonico`, `metodo`
+    ("exacto", "alias", "aproximado" o None si no hay coincidencia) y
+    `similitud`. Primero se busca la clave normalizada, después la tabla de
+    alias y por último los candidatos que comparten trigramas poco frecuentes.
+    """
+    filas = []
+    for nombre in pd.unique(pd.Series(list(nombres)).dropna()):
+        clave = normalizar_texto(nombre)
+        if clave in indice["por_clave"]:
+            filas.append((nombre, clave, indice["por_clave"][clave], "exacto", 1.0))
+        elif clave in indice["alias"]:
+            filas.append((nombre, clave, indice["alias"][clave], "alias", 1.0))
+        else:
+            canonico, similitud = _mejor_candidato(indice, clave, umbral)
+            filas.append((nombre, clave, canonico, "aproximado" if canonico else None, similitud))
+    return pd.DataFrame(filas, columns=["nombre", "clave", "canonico", "metodo", "similitud"])
+
+
+def mapear(indice, serie, umbral=UMBRAL_SIMILITUD):
+    """Reemplaza cada valor por su nombre canónico (NaN si no hay coincidencia).
+
+    Devuelve `(serie_mapeada, resolucion)`.
+    """
+    resolucion = resolver(indice, serie, umbral)
+    canonicos = resolucion.set_index("nombre")["canonico"]
+    return serie.map(canonicos), resolucion
+
+
+def sin_coincidencia(resolucion):
+    return resolucion.loc[resolucion["metodo"].isna(), "nombre"].tolist()
+
+
+def aprender_alias(alias, resolucion):
+    """Agrega a `alias` las coincidencias aproximadas, para que la próxima vez sean directas."""
+    nuevos = resolucion[resolucion["metodo"] == "aproximado"]
+    alias.update(zip(nuevos["clave"], nuevos["canonico"]))
+    return alias
+
+
+def cargar_alias(dominio, ruta=RUTA_ALIAS):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f).get(dominio, {})
+
+
+def guardar_alias(dominio, alias, ruta=RUTA_ALIAS):
+    tabla = {}
+    if os.path.exists(ruta):
+        with open(ruta, "r", encoding="utf-8") as f:
+            tabla = json.load(f)
+    tabla[dominio] = dict(sorted(alias.items()))
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(tabla, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+# Esquema por fuente: columna -> reglas. Reglas posibles:
+#   tipo: "texto", "numero" o "fecha" (las columnas se convierten a ese tipo)
+#   requerido: la celda no puede quedar vacía
+#   min / max: rango permitido (inclusive)
+#   positivo: estrictamente mayor que cero
+#   distinto_de_cero: cualquier valor salvo cero
+#   dia_primero: las fechas en texto son ISO o día/mes/año (07/08/2025 es 7 de agosto)
+# Las filas que no cumplen van a la cuarentena con el motivo.
+ESQUEMAS = {
+    "costos": {
+        "Empresa": {"tipo": "texto", "requerido": True},
+        "Especie": {"tipo": "texto", "requerido": True},
+        "Cultivo": {"tipo": "texto", "requerido": True},
+        "Superficie": {"tipo": "numero", "requerido": True, "positivo": True},
+        "Precio": {"tipo": "numero", "min": 0},
+        "Total": {"tipo": "numero", "requerido": True},
+    },
+    "presupuesto": {
+        "Especie": {"tipo": "texto", "requerido": True},
+        "Cultivo": {"tipo": "texto", "requerido": True},
+        "TipoInsumo": {"tipo": "texto", "requerido": True},
+        "TotalUSD": {"tipo": "numero", "requerido": True},
+    },
+    "produccion": {
+        "cultivo": {"tipo": "texto", "requerido": True},
+        "especie": {"tipo": "texto", "requerido": True},
+        "campo": {"tipo": "texto", "requerido": True},
+        "sup_total": {"tipo": "numero", "requerido": True, "positivo": True},
+        "sup_cosechada": {"tipo": "numero", "requerido": True, "positivo": True},
+        "avance": {"tipo": "numero", "min": 0, "max": 1},
+        "ton_chacra": {"tipo": "numero", "min": 0},
+        "rinde_chacra": {"tipo": "numero", "min": 0},
+        "ton_destino": {"tipo": "numero", "min": 0},
+        "rinde_destino": {"tipo": "numero", "min": 0},
+        "ton_acondicionado": {"tipo": "numero", "min": 0},
+        "rinde_acondicionado": {"tipo": "numero", "min": 0},
+    },
+    "produccion_economico": {
+        "cultivo": {"tipo": "texto", "requerido": True},
+        "especie": {"tipo": "texto", "requerido": True},
+        "campo": {"tipo": "texto", "requerido": True},
+        "sup_cosechada": {"tipo": "numero", "requerido": True, "positivo": True},
+        "ton_chacra": {"tipo": "numero", "min": 0},
+        "rinde_ha": {"tipo": "numero", "requerido": True, "min": 0},
+    },
+    "costos_economico": {
+        "cultivo": {"tipo": "texto", "requerido": True},
+        "costo_total": {"tipo": "numero", "requerido": True},
+    },
+    "ordenes_carga": {
+        "orden": {"tipo": "texto", "requerido": True},
+        "fecha": {"tipo": "fecha", "requerido": True, "dia_primero": True},
+        "empresa": {"tipo": "texto", "requerido": True},
+        "cultivo": {"tipo": "texto", "requerido": True},
+        "kg_origen": {"tipo": "numero", "requerido": True, "distinto_de_cero": True},
+        "kg_destino": {"tipo": "numero"},
+        "kg_final": {"tipo": "numero", "requerido": True},
+        "humedad": {"tipo": "numero", "min": 0, "max": 0.5},
+        "dif_kg": {"tipo": "numero"},
+        "dif_pct": {"tipo": "numero"},
+    },
+}
+
+
+FORMATOS_DIA_PRIMERO = ["%d/%m/%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y"]
+
+
+def _fecha(serie, dia_primero):
+    if not dia_primero or pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie, errors="coerce")
+    # Nunca se interpreta mes/día: lo que no es ISO ni día/mes/año no es fecha
+    texto = serie.astype("string").str.strip()
+    fechas = pd.to_datetime(texto, format="ISO8601", errors="coerce")
+    for formato in FORMATOS_DIA_PRIMERO:
+        fechas = fechas.fillna(pd.to_datetime(texto, format=formato, errors="coerce"))
+    return fechas
+
+
+def _convertir(serie, reglas):
+    tipo = reglas.get("tipo", "texto")
+    if tipo == "numero":
+        return pd.to_numeric(serie, errors="coerce")
+    if tipo == "fecha":
+        return _fecha(serie, reglas.get("dia_primero", False))
+    # Texto: se recortan espacios y las celdas en blanco cuentan como vacías
+    texto = serie.astype("string").str.strip()
+    return texto.mask(texto == "")
+
+
+def _fallas(original, valor, reglas):
+    """(máscara, motivo) por cada regla de una columna."""
+    tipo = reglas.get("tipo", "texto")
+    vacio = valor.isna() if tipo == "texto" else original.isna()
+    if tipo != "texto":
+        yield (~vacio & valor.isna()), f"no es {tipo}"
+    if reglas.get("requerido"):
+        yield vacio, "vacío"
+    if tipo == "numero":
+        yield np.isinf(valor), "infinito"
+        if "min" in reglas:
+            yield valor < reglas["min"], f"menor que {reglas['min']}"
+        if "max" in reglas:
+            yield valor > reglas["max"], f"mayor que {reglas['max']}"
+        if reglas.get("positivo"):
+            yield valor <= 0, "no positivo"
+        if reglas.get("distinto_de_cero"):
+            yield valor == 0, "igual a cero"
+
+
+def _separar(df, motivos, fuente):
+    invalidas = motivos != ""
+    cuarentena = df[invalidas].copy()
+    cuarentena.insert(0, "motivo", motivos[invalidas].str.rstrip("; "))
+    cuarentena.insert(0, "fuente", fuente)
+    return df[~invalidas], cuarentena
+
+
+def validar(df, fuente, esquema=None):
+    """Convierte las columnas al tipo del esquema y separa las filas inválidas.
+
+    Devuelve `(validos, cuarentena)`; la cuarentena conserva la fila tal como
+    quedó convertida y agrega las columnas `fuente` y `motivo`. Todas las
+    comprobaciones son por columna, sin recorrer filas.
+    """
+    esquema = ESQUEMAS[fuente] if esquema is None else esquema
+    df = df.copy()
+    motivos = pd.Series("", index=df.index, dtype=object)
+    for columna, reglas in esquema.items():
+        if columna not in df.columns:
+            motivos = motivos + f"{columna}: falta la columna; "
+            continue
+        original = df[columna]
+        valor = _convertir(original, reglas)
+        for mascara, motivo in _fallas(original, valor, reglas):
+            mascara = mascara.fillna(False).to_numpy(dtype=bool)
+            if mascara.any():
+                motivos = motivos.where(~mascara, motivos + f"{columna}: {motivo}; ")
+        df[columna] = valor
+    return _separar(df, motivos, fuente)
+
+
+def validar_referencia(df, columna, referencia, fuente, descripcion):
+    """Separa las filas cuyo `columna` no aparece en `referencia`."""
+    huerfanas = ~df[columna].isin(referencia)
+    motivos = pd.Series("", index=df.index, dtype=object).where(~huerfanas, f"{columna}: {descripcion}")
+    return _separar(df, motivos, fuente)
+
+
+def unir_cuarentenas(*cuarentenas):
+    no_vacias = [c for c in cuarentenas if not c.empty]
+    if not no_vacias:
+        return pd.DataFrame(columns=["fuente", "motivo"])
+    return pd.concat(no_vacias, ignore_index=True)
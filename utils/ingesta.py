@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from utils.artefactos import firma_archivo
+from utils.carga import RUTA_ORDENES_CARGA, leer_lote_ordenes, leer_ordenes_carga
+from utils.esquemas import unir_cuarentenas
+from utils.mermas import calcular_mermas
+
+# Carpeta donde se dejan los lotes nuevos de órdenes de carga durante la cosecha.
+# Cada lote incorporado se mueve a `procesados/`, que se vuelve a leer al reiniciar.
+CARPETA_ENTRADA = "data/entrada_ordenes"
+CARPETA_PROCESADOS = "procesados"
+EXTENSIONES = (".xlsx", ".xls", ".csv", ".json")
+# Un archivo modificado hace menos de estos segundos puede estar copiándose todavía
+ESPERA_ARCHIVO = 2
+INTERVALO_REFRESCO = 30
+
+CLAVES = ["empresa", "cultivo", "fecha"]
+SUMAS = ["kg_origen", "kg_final", "dif_kg", "merma_total_kg", "merma_esperada_kg", "merma_no_explicada_kg"]
+
+
+def _detalle(df):
+    return df.groupby(CLAVES)[SUMAS].sum().astype(float)
+
+
+def _diario(df):
+    diario = df.groupby("fecha")[SUMAS].sum().astype(float)
+    diario["avance_acumulado"] = diario["kg_final"].cumsum()
+    return diario
+
+
+def crear_almacen(df, cuarentena):
+    """Almacén de la cosecha en memoria a partir de órdenes ya pasadas por `calcular_mermas`.
+
+    No guarda las filas: solo los números de orden ya cargados y las sumas por
+    empresa / cultivo / día y por día (con el avance acumulado), que se
+    actualizan con cada lote nuevo.
+    """
+    return {
+        "lock": threading.Lock(),
+        "ordenes": set(df["orden"]),
+        "detalle": _detalle(df),
+        "diario": _diario(df),
+        "cuarentena": cuarentena,
+        # Archivos que no se pudieron incorporar: no se reintentan hasta que cambien
+        "fallidos": {},
+        "errores": {},
+        "filas_nuevas": 0,
+        "actualizado": datetime.now(),
+    }
+
+
+def _sumar_en_lugar(acumulado, parcial):
+    """Suma `parcial` sobre `acumulado` tocando solo las filas de `parcial`."""
+    existentes = parcial.index.isin(acumulado.index)
+    if existentes.any():
+        indice = parcial.index[existentes]
+        acumulado.loc[indice, SUMAS] += parcial.loc[indice, SUMAS]
+    if not existentes.all():
+        # Un día o cultivo nuevo: solo acá se reordena todo el resumen
+        acumulado = pd.concat([acumulado, parcial[~existentes]]).sort_index()
+    return acumulado
+
+
+def _agregar(almacen, df, cuarentena):
+    # Las órdenes ya cargadas no se modifican: solo entran números de orden nuevos
+    nuevas = df[~df["orden"].isin(almacen["ordenes"])].drop_duplicates("orden")
+    if len(nuevas):
+        # Todo lo que depende de los datos del lote se calcula antes de tocar el almacén
+        nuevas = calcular_mermas(nuevas)
+        detalle_lote, diario_lote = _detalle(nuevas), _diario(nuevas)[SUMAS]
+        almacen["ordenes"].update(nuevas["orden"])
+        almacen["detalle"] = _sumar_en_lugar(almacen["detalle"], detalle_lote)
+
+        diario = _sumar_en_lugar(almacen["diario"], diario_lote)
+        # El acumulado solo cambia desde el primer día del lote (normalmente hoy)
+        desde = diario.index.get_loc(nuevas["fecha"].min())
+        previo = diario["avance_acumulado"].iat[desde - 1] if desde else 0
+        diario.iloc[desde:, diario.columns.get_loc("avance_acumulado")] = (
+            previo + diario["kg_final"].iloc[desde:].cumsum()
+        )
+        almacen["diario"] = diario
+    if not cuarentena.empty:
+        almacen["cuarentena"] = unir_cuarentenas(almacen["cuarentena"], cuarentena)
+    almacen["filas_nuevas"] += len(nuevas)
+    almacen["actualizado"] = datetime.now()
+    return len(nuevas)
+
+
+def _es_lote(nombre):
+    return not nombre.startswith((".", "~$")) and nombre.lower().endswith(EXTENSIONES)
+
+
+def abrir_almacen(carpeta=CARPETA_ENTRADA, ruta=RUTA_ORDENES_CARGA):
+    """Almacén con el archivo de órdenes de carga más los lotes ya procesados."""
+    df, cuarentena = leer_ordenes_carga(ruta)
+    almacen = crear_almacen(calcular_mermas(df), cuarentena)
+    procesados = os.path.join(carpeta, CARPETA_PROCESADOS)
+    if os.path.isdir(procesados):
+        # Los nombres llevan la hora de llegada: ordenados, se reponen en el mismo orden
+        lotes = [leer_lote_ordenes(os.path.join(procesados, nombre))
+                 for nombre in sorted(os.listdir(procesados)) if _es_lote(nombre)]
+        if lotes:
+            _agregar(almacen, pd.concat([df for df, _ in lotes]), unir_cuarentenas(*[c for _, c in lotes]))
+        almacen["filas_nuevas"] = 0
+    return almacen
+
+
+def archivos_pendientes(almacen, carpeta=CARPETA_ENTRADA):
+    """Lotes de la carpeta de entrada listos para leer, del más viejo al más nuevo."""
+    if not os.path.isdir(carpeta):
+        return []
+    ahora = time.time()
+    pendientes = []
+    with os.scandir(carpeta) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file() or not _es_lote(entrada.name):
+                continue
+            firma = firma_archivo(entrada.path)
+            if ahora - firma["modificado"] < ESPERA_ARCHIVO or almacen["fallidos"].get(entrada.path) == firma:
+                continue
+            pendientes.append((entrada.path, firma))
+    return sorted(pendientes, key=lambda p: p[1]["modificado"])
+
+
+def _archivar(ruta, carpeta):
+    procesados = os.path.join(carpeta, CARPETA_PROCESADOS)
+    os.makedirs(procesados, exist_ok=True)
+    destino = os.path.join(procesados, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{os.path.basename(ruta)}")
+    os.replace(ruta, destino)
+
+
+def _marcar_fallido(almacen, ruta, firma, error):
+    almacen["fallidos"][ruta] = firma
+    almacen["errores"][ruta] = str(error)
+
+
+def ingerir(almacen, carpeta=CARPETA_ENTRADA):
+    """Incorpora los lotes nuevos de la carpeta de entrada y devuelve cuántas órdenes agregó.
+
+    El costo depende solo de los lotes nuevos. Si otra sesión ya está
+    ingiriendo, no espera: devuelve 0 y los cambios se ven en el próximo refresco.
+    """
+    if not almacen["lock"].acquire(blocking=False):
+        return 0
+    try:
+        leidos = {}
+        for ruta, firma in archivos_pendientes(almacen, carpeta):
+            try:
+                leidos[ruta] = (firma, *leer_lote_ordenes(ruta))
+            except Exception as e:
+                _marcar_fallido(almacen, ruta, firma, e)
+        if not leidos:
+            return 0
+        try:
+            agregadas = _agregar(almacen, pd.concat([df for _, df, _ in leidos.values()]),
+                                 unir_cuarentenas(*[c for _, _, c in leidos.values()]))
+        except Exception as e:
+            # Los lotes quedan en la carpeta de entrada y se reintentan cuando cambien
+            for ruta, (firma, _, _) in leidos.items():
+                _marcar_fallido(almacen, ruta, firma, e)
+            return 0
+        # Solo se archiva lo que ya está sumado en el almacén
+        for ruta, (firma, _, _) in leidos.items():
+            almacen["fallidos"].pop(ruta, None)
+            almacen["errores"].pop(ruta, None)
+            try:
+                _archivar(ruta, carpeta)
+            except OSError as e:
+                _marcar_fallido(almacen, ruta, firma, f"Incorporado pero no se pudo mover a {CARPETA_PROCESADOS}: {e}")
+        return agregadas
+    finally:
+        almacen["lock"].release()
+
+
+def opciones(almacen):
+    """Empresas, cultivos y rango de fechas presentes en el almacén."""
+    indice = almacen["detalle"].index
+    fechas = indice.get_level_values("fecha")
+    return (list(indice.get_level_values("empresa").unique()), list(indice.get_level_values("cultivo").unique()),
+            fechas.min(), fechas.max())
+
+
+def detalle(almacen, empresas=None, cultivos=None, desde=None, hasta=None):
+    """Sumas por empresa / cultivo / día que cumplen los filtros (None: sin filtrar).
+
+    Sirve como entrada de `resumen_diario_cosecha`, `resumen_cosecha_por_cultivo`
+    y `desglose_mermas`, que así no recorren las órdenes sino los grupos.
+    """
+    with almacen["lock"]:
+        df = almacen["detalle"].reset_index()
+    mascara = pd.Series(True, index=df.index)
+    if empresas is not None:
+        mascara &= df["empresa"].isin(empresas)
+    if cultivos is not None:
+        mascara &= df["cultivo"].isin(cultivos)
+    if desde is not None:
+        mascara &= df["fecha"] >= desde
+    if hasta is not None:
+        mascara &= df["fecha"] <= hasta
+    return df[mascara]
+
+
+def resumen_diario(almacen):
+    """Totales diarios y avance acumulado de toda la cosecha, tal como se mantienen en el almacén."""
+    with almacen["lock"]:
+        return almacen["diario"].reset_index()
@@ -0,0 +1,50 @@
+import sys
+import types
+from multiprocessing import context, spawn
+
+# Los workers de carga se arrancan con "spawn": "fork" copiaría el servidor de
+# Streamlit, que tiene varios hilos, y puede dejar el worker bloqueado en un lock.
+# Pero "spawn" hace que cada worker vuelva a importar el módulo __main__ del
+# proceso, y bajo Streamlit __main__ es la página que esté corriendo en ese
+# momento (cada rerun de cada sesión lo reemplaza): el worker ejecutaría la
+# página entera. Este contexto arranca los workers sin importar __main__.
+
+
+def _bajo_streamlit():
+    runtime = sys.modules.get("streamlit.runtime")
+    return runtime is not None and runtime.exists()
+
+
+def _datos_preparacion(nombre):
+    datos = spawn.get_preparation_data(nombre)
+    if _bajo_streamlit():
+        # Las tareas son funciones de utils: el worker las importa por su módulo
+        datos.pop("init_main_from_path", None)
+        datos.pop("init_main_from_name", None)
+    return datos
+
+
+if sys.platform != "win32":
+    from multiprocessing import popen_spawn_posix
+
+    class _Popen(popen_spawn_posix.Popen):
+        # El mismo arranque de multiprocessing, pero con los datos de
+        # preparación de arriba; no se toca nada global del proceso
+        _launch = types.FunctionType(
+            popen_spawn_posix.Popen._launch.__code__,
+            {**vars(popen_spawn_posix),
+             "spawn": types.SimpleNamespace(**{**vars(spawn), "get_preparation_data": _datos_preparacion})},
+        )
+
+    class _Proceso(context.SpawnProcess):
+        @staticmethod
+        def _Popen(process_obj):
+            return _Popen(process_obj)
+
+    class _Contexto(context.SpawnContext):
+        Process = _Proceso
+
+    contexto_trabajadores = _Contexto()
+else:
+    # En Windows no hay forma de arrancar el worker sin __main__: se carga en hilos
+    contexto_trabajadores = None
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Los DataFrames base se comparten entre sesiones (st.cache_resource). Con
+# copy-on-write, nada derivado de ellos (columnas, filtros, resúmenes) puede
+# modificarlos; en pandas 3 ya viene siempre activo
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+CLAVE_CACHE = "cache_resultados"
+
+# Memoria máxima (MB) de los resultados intermedios que guarda cada sesión;
+# al pasarla se descartan los usados hace más tiempo
+PRESUPUESTO_SESION_MB = float(os.environ.get("PRESUPUESTO_SESION_MB", 64))
+
+
+class _Cache(dict):
+    # Un dict común no admite referencias débiles, y el registro no debe
+    # mantener vivas las caches de sesiones que ya terminaron
+    pass
+
+
+_caches = weakref.WeakValueDictionary()
+_lock_caches = threading.Lock()
+
+
+def vista(df, mascara):
+    """Filas de `df` marcadas en `mascara`.
+
+    Sin filtro activo devuelve `df` tal cual; con filtro, la indexación
+    booleana copia las filas elegidas. Por eso se llama solo dentro de
+    `en_cache`, para calcular un resultado que después se reutiliza.
+    """
+    return df if mascara.all() else df[mascara]
+
+
+def huella(mascara):
+    """Clave corta de una máscara de filas, para usarla en la cache de la sesión."""
+    return hashlib.blake2b(np.packbits(mascara).tobytes(), digest_size=12).hexdigest()
+
+
+def tamano(objeto):
+    """Bytes aproximados de un resultado (DataFrame, Series, array o tupla de ellos)."""
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        return int(np.sum(objeto.memory_usage(deep=True)))
+    if isinstance(objeto, np.ndarray):
+        return objeto.nbytes
+    if isinstance(objeto, (tuple, list)):
+        return sum(tamano(o) for o in objeto)
+    return sys.getsizeof(objeto)
+
+
+def nueva_cache(presupuesto_mb=PRESUPUESTO_SESION_MB):
+    """Cache LRU de resultados intermedios para guardar en `st.session_state`."""
+    cache = _Cache(entradas=OrderedDict(), bytes=0, presupuesto=int(presupuesto_mb * 2 ** 20),
+                   aciertos=0, fallos=0, desalojos=0)
+    with _lock_caches:
+        _caches[id(cache)] = cache
+    return cache
+
+
+def cache_de_sesion(estado):
+    """Cache de la sesión guardada en `estado` (`st.session_state`), creada la primera vez."""
+    if CLAVE_CACHE not in estado:
+        estado[CLAVE_CACHE] = nueva_cache()
+    return estado[CLAVE_CACHE]
+
+
+def en_cache(cache, clave, calcular, *args):
+    """Devuelve `calcular(*args)`, guardado en `cache` bajo `clave` mientras entre en el presupuesto."""
+    entradas = cache["entradas"]
+    if clave in entradas:
+        entradas.move_to_end(clave)
+        cache["aciertos"] += 1
+        return entradas[clave][0]
+
+    cache["fallos"] += 1
+    resultado = calcular(*args)
+    bytes_resultado = tamano(resultado)
+    if bytes_resultado > cache["presupuesto"]:
+        # Nunca entraría: se devuelve sin guardar y sin desalojar nada
+        return resultado
+    while entradas and cache["bytes"] + bytes_resultado > cache["presupuesto"]:
+        _, (_, bytes_desalojados) = entradas.popitem(last=False)
+        cache["bytes"] -= bytes_desalojados
+        cache["desalojos"] += 1
+    entradas[clave] = (resultado, bytes_resultado)
+    cache["bytes"] += bytes_resultado
+    return resultado
+
+
+def uso(cache):
+    """Métricas de memoria de una sesión."""
+    return {
+        "mb": cache["bytes"] / 2 ** 20,
+        "presupuesto_mb": cache["presupuesto"] / 2 ** 20,
+        "resultados": len(cache["entradas"]),
+        "aciertos": cache["aciertos"],
+        "fallos": cache["fallos"],
+        "desalojos": cache["desalojos"],
+    }
+
+
+def uso_por_sesion():
+    """Métricas de todas las sesiones vivas del proceso, una fila por sesión."""
+    with _lock_caches:
+        caches = list(_caches.values())
+    return pd.DataFrame([uso(cache) for cache in caches],
+                        columns=["mb", "presupuesto_mb", "resultados", "aciertos", "fallos", "desalojos"])
+
+
+def memoria_proceso_mb():
+    """Memoria residente (RSS) actual del proceso, o None si el sistema no la informa."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Fuera de Linux solo está el máximo alcanzado (en bytes en macOS)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2 ** 20 if sys.platform == "darwin" else pico / 2 ** 10
+
+
+def texto_memoria(cache):
+    """Valor y ayuda para la métrica de memoria de la barra lateral."""
+    memoria = uso(cache)
+    sesiones = uso_por_sesion()
+    proceso = memoria_proceso_mb()
+    ayuda = (f"Resultados guardados por esta sesión: {memoria['resultados']} "
+             f"({memoria['desalojos']} desalojados). {len(sesiones)} sesiones guardan "
+             f"{sesiones['mb'].sum():.1f} MB en total.")
+    if proceso is not None:
+        ayuda += f" Memoria residente del proceso: {proceso:.0f} MB."
+    return f"{memoria['mb']:.2f} / {memoria['presupuesto_mb']:.0f} MB", ayuda
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+
+def _tabla_secado(humedad_base, manipuleo, humedad_max=30.0, paso=0.1):
+    """Tabla (humedad %, merma %) para secar hasta `humedad_base`.
+
+    Por encima de la base se descuenta el agua evaporada,
+    (H - base) / (100 - base), más la merma fija de manipuleo. En la base
+    o por debajo no hay descuento.
+    """
+    humedad = np.round(np.arange(humedad_base, humedad_max + paso, paso), 2)
+    merma = (humedad - humedad_base) / (100 - humedad_base) * 100 + manipuleo
+    merma[0] = 0.0
+    return humedad, merma
+
+
+# Tablas de merma por humedad según especie. Se pueden reemplazar por las
+# tablas del acopio; solo se exige que la humedad esté ordenada.
+TABLAS_MERMA_HUMEDAD = {
+    "soja": _tabla_secado(13.5, 0.25),
+    "maiz": _tabla_secado(14.5, 0.25),
+    "trigo": _tabla_secado(14.0, 0.10),
+    "colza": _tabla_secado(8.0, 0.50),
+    "carinata": _tabla_secado(8.0, 0.50),
+    "girasol": _tabla_secado(11.0, 0.50),
+    "cebada": _tabla_secado(12.5, 0.10),
+}
+
+# Patrones para reconocer la especie dentro del nombre del cultivo
+# ("Pinos Maíz2 24/25"); el de maíz cubre también "Maiz" y "MaÃ­z"
+_PATRONES_ESPECIE = {
+    "soja": r"soja",
+    "maiz": r"ma(?:i|í|ã­)z",
+    "trigo": r"trigo",
+    "colza": r"colza",
+    "carinata": r"carinata",
+    "girasol": r"girasol",
+    "cebada": r"cebada",
+}
+
+
+def especie_de_cultivo(cultivos):
+    """Devuelve la especie (clave de las tablas) de cada cultivo, o NaN."""
+    # Hay pocos cultivos distintos: se reconocen una vez y se expanden por código
+    codigos, unicos = pd.factorize(cultivos, use_na_sentinel=False)
+    unicos = pd.Series(unicos).astype(str).str.lower()
+    condiciones = [unicos.str.contains(patron, regex=True) for patron in _PATRONES_ESPECIE.values()]
+    especies = pd.Series(np.select(condiciones, list(_PATRONES_ESPECIE), default=None), dtype="category")
+    return pd.Series(
+        pd.Categorical.from_codes(especies.cat.codes.to_numpy()[codigos], especies.cat.categories),
+        index=cultivos.index
+    )
+
+
+def merma_por_humedad_pct(humedad, especies, tablas=TABLAS_MERMA_HUMEDAD):
+    """Merma esperada (%) por secado y manipuleo.
+
+    `humedad` viene como fracción, igual que en el Excel (0.1675 = 16,75 %).
+    Se interpola linealmente en la tabla de cada especie; el bucle es por
+    especie, no por orden de carga. Especies sin tabla quedan en 0.
+    """
+    humedad_pct = humedad.to_numpy(dtype=float, na_value=np.nan) * 100
+    codigos = especies.astype("category")
+    merma = np.zeros(len(humedad_pct))
+    for especie, filas in codigos.groupby(codigos, observed=True).indices.items():
+        if especie not in tablas:
+            continue
+        puntos_humedad, puntos_merma = tablas[especie]
+        h = humedad_pct[filas]
+        # Por debajo de la tabla no hay merma; por encima se extrapola la pendiente
+        valores = np.interp(h, puntos_humedad, puntos_merma, left=0.0)
+        pendiente = (puntos_merma[-1] - puntos_merma[-2]) / (puntos_humedad[-1] - puntos_humedad[-2])
+        encima = h > puntos_humedad[-1]
+        valores[encima] = puntos_merma[-1] + (h[encima] - puntos_humedad[-1]) * pendiente
+        merma[filas] = np.nan_to_num(valores)
+    return pd.Series(merma, index=humedad.index)
+
+
+def calcular_mermas(df, tablas=TABLAS_MERMA_HUMEDAD):
+    """Agrega a las órdenes de carga la merma total, la esperada y la no explicada (Kg).
+
+    La merma esperada se aplica sobre los Kg recibidos en destino (o los de
+    origen si falta el dato). La no explicada es lo que queda de la merma
+    total una vez descontada la esperada.
+    """
+    df = df.copy()
+    especies = especie_de_cultivo(df["cultivo"])
+    kg_base = df["kg_destino"].fillna(df["kg_origen"]) if "kg_destino" in df.columns else df["kg_origen"]
+    df["especie_merma"] = especies
+    df["merma_humedad_pct"] = merma_por_humedad_pct(df["humedad"], especies, tablas)
+    df["merma_total_kg"] = df["kg_origen"] - df["kg_final"]
+    df["merma_esperada_kg"] = kg_base * df["merma_humedad_pct"] / 100
+    df["merma_no_explicada_kg"] = df["merma_total_kg"] - df["merma_esperada_kg"]
+    return df
+
+
+def desglose_mermas(df, por=("empresa", "cultivo", "fecha")):
+    """Suma de mermas esperadas y no explicadas por grupo.
+
+    `df` debe venir de `calcular_mermas`.
+    """
+    resumen = df.groupby(list(por), observed=True).agg({
+        "kg_origen": "sum",
+        "kg_final": "sum",
+        "merma_total_kg": "sum",
+        "merma_esperada_kg": "sum",
+        "merma_no_explicada_kg": "sum"
+    }).reset_index()
+    kg_origen = resumen["kg_origen"].where(resumen["kg_origen"] != 0)
+    resumen["merma_total_pct"] = resumen["merma_total_kg"] / kg_origen
+    resumen["merma_no_explicada_pct"] = resumen["merma_no_explicada_kg"] / kg_origen
+    return resumen